@@ -3,6 +3,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 from uuid import uuid4
+import asyncio
+import functools
 import time
 import logging
 
@@ -83,27 +85,50 @@ class ChatResponse(BaseModel):
 
 class ConversationStore:
     def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Return a working copy of a conversation's state: input_items, context, current_agent."""
         pass
 
     def save(self, conversation_id: str, state: Dict[str, Any]):
+        """Persist a conversation's context and current agent. History is written only by append_input_items."""
+        pass
+
+    def append_input_items(self, conversation_id: str, items: List[Dict[str, Any]]):
+        """Append new input items to a conversation without rewriting its history."""
         pass
 
 class InMemoryConversationStore(ConversationStore):
     _conversations: Dict[str, Dict[str, Any]] = {}
 
     def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
-        return self._conversations.get(conversation_id)
+        stored = self._conversations.get(conversation_id)
+        if stored is None:
+            return None
+        # Callers extend their own list; history only changes through append_input_items
+        return {**stored, "input_items": list(stored["input_items"])}
 
     def save(self, conversation_id: str, state: Dict[str, Any]):
-        self._conversations[conversation_id] = state
+        stored = self._conversations.setdefault(conversation_id, {"input_items": []})
+        stored["context"] = state["context"]
+        stored["current_agent"] = state["current_agent"]
+
+    def append_input_items(self, conversation_id: str, items: List[Dict[str, Any]]):
+        self._conversations[conversation_id]["input_items"].extend(items)
 
 # TODO: when deploying this app in scale, switch to your own production-ready implementation
 conversation_store = InMemoryConversationStore()
 
+# In-flight end-of-turn writes by conversation. Holds strong references so the
+# tasks aren't garbage collected, and lets the next turn of the same
+# conversation wait for its predecessor so history stays in order.
+pending_writes: Dict[str, asyncio.Task] = {}
+
 # =========================
 # Helpers
 # =========================
 
+# Sentinel for context keys that didn't exist before this turn
+_MISSING = object()
+
 def _resolve_agent(agent_name: str):
     """Return the agent instance that matches the given name."""
     if agent_name == HostAgent.name:
@@ -127,6 +152,36 @@ def _get_agent_by_name(name: str):
     }
     return agents.get(name, HostAgent)
 
+def _persist_turn(conversation_id: str, state: Dict[str, Any], new_items: List[Dict[str, Any]]):
+    """Write the end-of-turn context/agent and this turn's input items to the store."""
+    conversation_store.save(conversation_id, state)
+    conversation_store.append_input_items(conversation_id, new_items)
+
+def _persist_in_background(conversation_id: str, state: Dict[str, Any], new_items: List[Dict[str, Any]]):
+    """Schedule end-of-turn persistence so the response doesn't wait on store I/O.
+    The worker thread writes a snapshot, never the live state."""
+    snapshot = {
+        "context": state["context"].model_copy(deep=True),
+        "current_agent": state["current_agent"],
+    }
+    task = asyncio.create_task(asyncio.to_thread(_persist_turn, conversation_id, snapshot, list(new_items)))
+    pending_writes[conversation_id] = task
+    task.add_done_callback(functools.partial(_on_persisted, conversation_id))
+
+def _on_persisted(conversation_id: str, task: asyncio.Task):
+    """Drop a finished end-of-turn write and log it if it failed."""
+    if pending_writes.get(conversation_id) is task:
+        del pending_writes[conversation_id]
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Failed to persist conversation %s", conversation_id, exc_info=task.exception())
+
+async def _wait_for_pending_write(conversation_id: str):
+    """Let the previous turn's end-of-turn write land before this turn reads the store."""
+    task = pending_writes.get(conversation_id)
+    if task is not None:
+        # asyncio.wait doesn't raise; a failed write is logged by _on_persisted
+        await asyncio.wait({task})
+
 def _get_guardrail_name(g) -> str:
     """Extract a friendly guardrail name."""
     name_attr = getattr(g, "name", None)
@@ -168,12 +223,14 @@ async def chat_endpoint(req: ChatRequest):
     Handles conversation state, agent routing, and guardrail checks.
     """
     # Initialize or retrieve conversation state
-    is_new = not req.conversation_id or conversation_store.get(req.conversation_id) is None
-    if is_new:
+    if req.conversation_id:
+        await _wait_for_pending_write(req.conversation_id)
+    state = conversation_store.get(req.conversation_id) if req.conversation_id else None
+    if state is None:
         conversation_id: str = uuid4().hex
         ctx = create_initial_context()
         current_agent_name = HostAgent.name
-        state: Dict[str, Any] = {
+        state = {
             "input_items": [],
             "context": ctx,
             "current_agent": current_agent_name,
@@ -181,22 +238,23 @@ async def chat_endpoint(req: ChatRequest):
         # If empty message on new conversation, trigger agent to send greeting
         if req.message.strip() == "":
             # Add a special trigger message to get the agent to greet
-            state["input_items"].append({"role": "user", "content": "[START_CONVERSATION]"})
+            user_item = {"role": "user", "content": "[START_CONVERSATION]"}
         else:
-            state["input_items"].append({"role": "user", "content": req.message})
+            user_item = {"role": "user", "content": req.message}
     else:
         conversation_id = req.conversation_id  # type: ignore
-        state = conversation_store.get(conversation_id)
         # Add the user's message to the history as a dict (SDK handles dicts fine)
-        state["input_items"].append({"role": "user", "content": req.message})
+        user_item = {"role": "user", "content": req.message}
+    state["input_items"].append(user_item)
 
     # Ensure current_agent is properly resolved
     current_agent_name = state.get("current_agent", HostAgent.name)
     current_agent = _resolve_agent(current_agent_name)
     # Save the current agent name in state (in case it was defaulted)
     state["current_agent"] = current_agent.name
-    # Save the updated state back to the store
+    # Save the updated state back to the store; history grows by the user message only
     conversation_store.save(conversation_id, state)
+    conversation_store.append_input_items(conversation_id, [user_item])
     
     old_context = state["context"].model_dump().copy()
     guardrail_checks: List[GuardrailCheck] = []
@@ -227,7 +285,10 @@ async def chat_endpoint(req: ChatRequest):
                     timestamp=gr_timestamp,
                 ))
             refusal = "Sorry, I can only help with questions related to your health symptoms and over-the-counter medication options."
-            state["input_items"].append({"role": "assistant", "content": refusal})
+            refusal_item = {"role": "assistant", "content": refusal}
+            state["input_items"].append(refusal_item)
+            conversation_store.save(conversation_id, state)
+            conversation_store.append_input_items(conversation_id, [refusal_item])
             return ChatResponse(
                 conversation_id=conversation_id,
                 current_agent=current_agent.name,
@@ -364,13 +425,9 @@ async def chat_endpoint(req: ChatRequest):
 
     # Update state with current active agent
     state["current_agent"] = active_agent_name
-    conversation_store.save(conversation_id, state)
 
     # Show differences in context
-    context_changes = []
-    for key in new_context:
-        if key not in old_context or new_context[key] != old_context[key]:
-            context_changes.append(key)
+    context_changes = [k for k, v in new_context.items() if old_context.get(k, _MISSING) != v]
 
     if context_changes:
         events.append(
@@ -383,16 +440,14 @@ async def chat_endpoint(req: ChatRequest):
             )
         )
 
-    # Build input list excluding handoff items, then serialize
-    filtered_inputs = [
-        item for item in result.to_input_list() if not isinstance(item, HandoffOutputItem)
-    ]
-    state["input_items"] = [
+    # Only the items produced by this turn need serializing - everything before
+    # them is already in the store, so append the tail instead of rewriting history
+    new_inputs = result.to_input_list()[len(state["input_items"]):]
+    new_items = [
         item.model_dump() if hasattr(item, 'model_dump') else 
         (item.dict() if hasattr(item, 'dict') else item) 
-        for item in filtered_inputs
+        for item in new_inputs if not isinstance(item, HandoffOutputItem)
     ]
-    conversation_store.save(conversation_id, state)
 
     # Build guardrail results: mark failures (if any), and any others as passed
     final_guardrails: List[GuardrailCheck] = []
@@ -411,6 +466,11 @@ async def chat_endpoint(req: ChatRequest):
                 timestamp=time.time() * 1000,
             ))
 
+    # The start-of-turn save above is synchronous, so the conversation already
+    # exists in the store; the end-of-turn write can happen after we respond.
+    # The next turn of this conversation waits for it before reading the store.
+    _persist_in_background(conversation_id, state, new_items)
+
     return ChatResponse(
         conversation_id=conversation_id,
         current_agent=active_agent_name,  # Use the final active agent name
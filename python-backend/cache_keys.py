@@ -0,0 +1,27 @@
+"""
+Hashable keys for memoizing functions that take plain dicts of inputs
+"""
+from typing import Any, Dict, Tuple
+
+
+def freeze(values: Dict[str, Any]) -> Tuple[Tuple[str, type, Any], ...]:
+    """
+    Hashable, order-independent key for a dict of inputs
+    
+    Value types are part of the key: False == 0 and 4 == 4.0 as dict keys,
+    but callers tell them apart (e.g. fever_present is False, or a feature
+    echoed back as given). Lists become tuples; other unhashable values
+    (e.g. nested dicts) make hashing the key raise TypeError.
+    """
+    return tuple(sorted(
+        (key, type(value), tuple(value) if isinstance(value, list) else value)
+        for key, value in values.items()
+    ))
+
+
+def thaw(values_key: Tuple[Tuple[str, type, Any], ...]) -> Dict[str, Any]:
+    """Inverse of freeze"""
+    return {
+        key: list(value) if value_type is list else value
+        for key, value_type, value in values_key
+    }
@@ -4,42 +4,46 @@ Constructs probability graphs from calculators
 """
 
 from typing import Dict, Any, List
+import functools
+import logging
 import random
 
+logger = logging.getLogger(__name__)
+
 # Mandatory Safety Questions for Urology
 # These MUST be asked before entropy-driven questions
-MANDATORY_SAFETY_QUESTIONS = [
+MANDATORY_SAFETY_QUESTIONS = (
     {
         "id": "blood_in_urine",
         "question": "Have you noticed any blood in your urine, even if just once?",
         "rationale": "Critical for ruling out bladder cancer, kidney stones, severe infection",
-        "rules_out": ["bladder_cancer", "kidney_stones", "severe_infection"]
+        "rules_out": ("bladder_cancer", "kidney_stones", "severe_infection")
     },
     {
         "id": "severe_sudden_pain",
         "question": "Have you experienced any sudden, severe pain?",
         "rationale": "Critical for ruling out testicular torsion, kidney stone, acute retention",
-        "rules_out": ["testicular_torsion", "kidney_stones", "acute_urinary_retention"]
+        "rules_out": ("testicular_torsion", "kidney_stones", "acute_urinary_retention")
     },
     {
         "id": "fever_unwell",
         "question": "Do you have a fever or feel generally very unwell?",
         "rationale": "Critical for ruling out sepsis, severe pyelonephritis",
-        "rules_out": ["sepsis", "pyelonephritis", "severe_prostatitis"]
+        "rules_out": ("sepsis", "pyelonephritis", "severe_prostatitis")
     },
     {
         "id": "weight_loss",
         "question": "Have you had any unexplained weight loss recently?",
         "rationale": "Red flag for malignancy",
-        "rules_out": ["prostate_cancer", "bladder_cancer", "renal_cancer"]
+        "rules_out": ("prostate_cancer", "bladder_cancer", "renal_cancer")
     },
     {
         "id": "family_history_cancer",
         "question": "Does anyone in your immediate family have a history of prostate or bladder cancer?",
         "rationale": "Risk stratification for malignancy",
-        "rules_out": ["prostate_cancer", "bladder_cancer"]
+        "rules_out": ("prostate_cancer", "bladder_cancer")
     }
-]
+)
 
 from .graph_engine import ProbabilityGraph
 # from .pain_conditions import PAIN_SYMPTOM_MATRIX  # Commented out - urology only
@@ -53,9 +57,18 @@ def build_graph_from_calculators() -> ProbabilityGraph:
     For now, we're a UROLOGY consultation service, so we only build urology graph.
     Future: Could detect domain and build appropriate graph.
     
+    The structure is built once and shared; each call gets its own copy of
+    the node state.
+    
     Returns:
         ProbabilityGraph with nodes and edges from all calculators
     """
+    return _template_graph().clone_state()
+
+
+@functools.lru_cache(maxsize=1)
+def _template_graph() -> ProbabilityGraph:
+    """Calculator graph built once; callers must clone_state() before mutating"""
     graph = ProbabilityGraph()
     
     # ONLY add urology condition nodes (we're a urology service)
@@ -208,21 +221,22 @@ def populate_graph_from_context(graph: ProbabilityGraph, context: Dict[str, Any]
     # Mark known symptoms as present
     reported_symptoms = context.get("reported_symptoms", [])
     
-    print(f"DEBUG populate_graph_from_context: reported_symptoms = {reported_symptoms}")
-    print(f"DEBUG populate_graph_from_context: graph has {len(graph.nodes)} nodes")
-    print(f"DEBUG populate_graph_from_context: available symptom nodes = {[n for n, d in graph.nodes.items() if d['type'] == 'symptom'][:10]}")
+    # Normalize symptom text to node IDs in one pass, then match against the graph
+    normalized = {symptom_text.lower().replace(" ", "_") for symptom_text in reported_symptoms}
+    present = normalized & graph.nodes.keys()
     
-    for symptom_text in reported_symptoms:
-        # Normalize symptom text to node IDs
-        symptom_id = symptom_text.lower().replace(" ", "_")
-        
-        print(f"DEBUG populate_graph_from_context: Looking for symptom_id '{symptom_id}' in graph...")
-        
-        if symptom_id in graph.nodes:
-            graph.nodes[symptom_id]["value"] = 1.0
-            print(f"DEBUG populate_graph_from_context: ✅ Found and populated '{symptom_id}' with value 1.0")
-        else:
-            print(f"DEBUG populate_graph_from_context: ❌ NOT FOUND: '{symptom_id}' not in graph.nodes")
+    for symptom_id in present:
+        graph.nodes[symptom_id].value = 1.0
+    
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("populate_graph_from_context: reported_symptoms = %s", reported_symptoms)
+        logger.debug("populate_graph_from_context: graph has %d nodes", len(graph.nodes))
+        logger.debug(
+            "populate_graph_from_context: available symptom nodes = %s",
+            [n for n, d in graph.nodes.items() if d.type == 'symptom'][:10]
+        )
+        logger.debug("populate_graph_from_context: populated %s with value 1.0", sorted(present))
+        logger.debug("populate_graph_from_context: not in graph.nodes: %s", sorted(normalized - present))
     
     return graph
 
@@ -240,13 +254,13 @@ def extract_differential_results(graph: ProbabilityGraph, top_n: int = 5) -> Lis
     """
     disease_nodes = [
         {
-            "condition": node["label"],
-            "condition_id": node["id"],
-            "probability": node.get("probability", 0.5),
-            "percentage": round(node.get("probability", 0.5) * 100, 1)
+            "condition": node.label,
+            "condition_id": node.id,
+            "probability": node.probability,
+            "percentage": round(node.probability * 100, 1)
         }
         for node in graph.nodes.values()
-        if node["type"] == "disease"
+        if node.type == "disease"
     ]
     
     # Sort by probability
@@ -255,6 +269,44 @@ def extract_differential_results(graph: ProbabilityGraph, top_n: int = 5) -> Lis
     return disease_nodes[:top_n]
 
 
+def _severity_question(symptom_label: str) -> str:
+    return f"On a scale of 0-10, how severe is your {symptom_label.lower()}?"
+
+
+def _swelling_question(symptom_label: str) -> str:
+    return f"Do you have {symptom_label.lower()}? If yes, how pronounced is it (0-10)?"
+
+
+def _fever_question(symptom_label: str) -> str:
+    return "Do you have a fever? If yes, what is your temperature?"
+
+
+def _cough_question(symptom_label: str) -> str:
+    return "Do you have a cough?"
+
+
+def _yes_no_question(symptom_label: str) -> str:
+    return f"Do you have {symptom_label.lower()}?"
+
+
+# Map symptom types to question templates: (symptom ID fragments, template), first match wins
+_QUESTION_TEMPLATES = (
+    (("pain", "ache"), _severity_question),
+    (("swelling",), _swelling_question),
+    (("fever",), _fever_question),
+    (("cough",), _cough_question),
+)
+
+
+@functools.lru_cache(maxsize=256)
+def _question_template(symptom_id: str):
+    """Template chosen by symptom ID alone, classified once per ID"""
+    for fragments, template in _QUESTION_TEMPLATES:
+        if any(fragment in symptom_id for fragment in fragments):
+            return template
+    return None
+
+
 def format_siqorstaa_question(symptom_id: str, symptom_label: str) -> str:
     """
     Format a symptom into a proper SIQORSTAA-style question
@@ -266,18 +318,11 @@ def format_siqorstaa_question(symptom_id: str, symptom_label: str) -> str:
     Returns:
         Formatted question string
     """
-    # Map symptom types to question templates
-    if "pain" in symptom_id or "ache" in symptom_id:
-        return f"On a scale of 0-10, how severe is your {symptom_label.lower()}?"
+    template = _question_template(symptom_id)
     
-    if "swelling" in symptom_id or "swollen" in symptom_label.lower():
-        return f"Do you have {symptom_label.lower()}? If yes, how pronounced is it (0-10)?"
-    
-    if "fever" in symptom_id:
-        return f"Do you have a fever? If yes, what is your temperature?"
-    
-    if "cough" in symptom_id:
-        return f"Do you have a cough?"
+    # Swelling is also recognised from the label, ranking just below pain/ache
+    if template is not _severity_question and "swollen" in symptom_label.lower():
+        template = _swelling_question
     
     # Default yes/no question
-    return f"Do you have {symptom_label.lower()}?"
+    return (template or _yes_no_question)(symptom_label)
@@ -2,40 +2,185 @@
 Graph Reasoning Engine - FindPivots Algorithm & Entropy Calculations
 Based on bounded propagation for efficient probabilistic reasoning
 """
+from dataclasses import dataclass, field
 from typing import Dict, List, Set, Tuple, Any
+import functools
+import logging
 import math
+import sys
+
+from cache_keys import freeze, thaw
+
+from .urology_calculator import compute_branch_entropies, compute_log_odds
+
+logger = logging.getLogger(__name__)
+
+_NODE_FIELDS = ("id", "type", "value", "probability", "label")
+
+
+@dataclass(slots=True)
+class Node:
+    """A graph node; attributes beyond the common ones are kept in ``extra``"""
+    id: str
+    type: str
+    value: Any = None
+    probability: float = 0.5
+    label: str = ""
+    extra: Dict[str, Any] = field(default_factory=dict)
+    
+    @classmethod
+    def from_dict(cls, node_id: str, data: Dict[str, Any]) -> "Node":
+        """Build a node from its exported dict form"""
+        return cls(
+            id=sys.intern(node_id),
+            type=data.get("type", ""),
+            value=data.get("value"),
+            probability=data.get("probability", 0.5),
+            label=data.get("label", ""),
+            extra={k: v for k, v in data.items() if k not in _NODE_FIELDS},
+        )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Export node as dictionary"""
+        return {
+            "id": self.id,
+            "type": self.type,
+            "value": self.value,
+            "probability": self.probability,
+            "label": self.label,
+            **self.extra
+        }
 
 
 class ProbabilityGraph:
     """Represents a probabilistic reasoning graph with nodes and edges"""
     
     def __init__(self):
-        self.nodes: Dict[str, Dict[str, Any]] = {}
+        self.nodes: Dict[str, Node] = {}
         self.edges: List[Dict[str, Any]] = []
+        # Adjacency index so traversals only touch edges incident to a node
+        self.out_adj: Dict[str, List[Tuple[str, float]]] = {}
+        self.in_adj: Dict[str, List[Tuple[str, float]]] = {}
+        # Disease node IDs in insertion order, so disease-wide passes skip symptom nodes
+        self.disease_ids: List[str] = []
+        # Integer-indexed view for bitset traversals, built lazily by index()
+        self._int_index = None
+        # True while edges, adjacency and disease_ids are shared with a clone
+        self._shared_structure = False
+        # Current diagnostic entropy (bits), taken from a "_metadata" node if one is added
+        self.current_entropy: float = 2.0
+    
+    @classmethod
+    def from_dict(cls, graph_dict: Dict[str, Any]) -> "ProbabilityGraph":
+        """Build a graph (including its adjacency index) from a to_dict() export
+        
+        Edge weights should be positive: find_pivots treats them as distances.
+        """
+        graph = cls()
+        graph.nodes = {
+            sys.intern(node_id): Node.from_dict(node_id, data)
+            for node_id, data in graph_dict["nodes"].items()
+        }
+        graph.disease_ids = [
+            node_id for node_id, node in graph.nodes.items() if node.type == "disease"
+        ]
+        metadata = graph.nodes.get("_metadata")
+        if metadata is not None:
+            graph.current_entropy = metadata.extra.get("entropy", 2.0)
+        for edge in graph_dict["edges"]:
+            graph.add_edge(edge["from"], edge["to"], edge.get("weight", 1.0))
+        return graph
     
     def add_node(self, node_id: str, node_type: str, **kwargs):
         """Add a node to the graph"""
-        self.nodes[node_id] = {
-            "id": node_id,
-            "type": node_type,
-            "value": kwargs.get("value"),
-            "probability": kwargs.get("probability", 0.5),
-            **kwargs
-        }
+        self._own_structure()
+        if node_type == "disease" and node_id not in self.nodes:
+            self.disease_ids.append(node_id)
+        self._int_index = None
+        node_id = sys.intern(node_id)
+        self.nodes[node_id] = Node(
+            id=node_id,
+            type=node_type,
+            value=kwargs.pop("value", None),
+            probability=kwargs.pop("probability", 0.5),
+            label=kwargs.pop("label", ""),
+            extra=kwargs,
+        )
+        if node_id == "_metadata":
+            self.current_entropy = kwargs.get("entropy", 2.0)
     
     def add_edge(self, from_id: str, to_id: str, weight: float = 1.0):
         """Add a weighted edge"""
+        self._own_structure()
+        from_id = sys.intern(from_id)
+        to_id = sys.intern(to_id)
         self.edges.append({
             "from": from_id,
             "to": to_id,
             "weight": weight
         })
+        self.out_adj.setdefault(from_id, []).append((to_id, weight))
+        self.in_adj.setdefault(to_id, []).append((from_id, weight))
+        self._int_index = None
+    
+    def _own_structure(self):
+        """Copy structure shared with a clone before this graph changes it"""
+        if self._shared_structure:
+            self.edges = list(self.edges)
+            self.out_adj = {node_id: list(targets) for node_id, targets in self.out_adj.items()}
+            self.in_adj = {node_id: list(sources) for node_id, sources in self.in_adj.items()}
+            self.disease_ids = list(self.disease_ids)
+            self._shared_structure = False
+    
+    def index(self) -> Tuple[List[str], Dict[str, int], List[List[Tuple[int, float]]]]:
+        """
+        Integer view of the graph for bitset traversals
+        
+        Returns:
+            (node_ids, node_idx, out_idx) where node_ids[i] is the ID of node i,
+            node_idx maps IDs back to i, and out_idx[i] lists (target_index, weight)
+        """
+        if self._int_index is None:
+            node_idx: Dict[str, int] = {node_id: i for i, node_id in enumerate(self.nodes)}
+            for from_id, targets in self.out_adj.items():
+                node_idx.setdefault(from_id, len(node_idx))
+                for to_id, _ in targets:
+                    node_idx.setdefault(to_id, len(node_idx))
+            
+            out_idx: List[List[Tuple[int, float]]] = [[] for _ in node_idx]
+            for from_id, targets in self.out_adj.items():
+                out_idx[node_idx[from_id]] = [(node_idx[to_id], weight) for to_id, weight in targets]
+            
+            self._int_index = (list(node_idx), node_idx, out_idx)
+        return self._int_index
+    
+    def clone_state(self) -> "ProbabilityGraph":
+        """
+        Copy of the graph's per-session state over the same structure
+        
+        Nodes (values, probabilities) are copied; edges, adjacency and the
+        integer index are shared with this graph until either one adds a
+        node or edge, which copies them first.
+        """
+        graph = ProbabilityGraph.__new__(ProbabilityGraph)
+        graph.nodes = {
+            node_id: Node(node.id, node.type, node.value, node.probability, node.label, dict(node.extra))
+            for node_id, node in self.nodes.items()
+        }
+        graph.edges = self.edges
+        graph.out_adj = self.out_adj
+        graph.in_adj = self.in_adj
+        graph.disease_ids = self.disease_ids
+        graph._int_index = self.index()
+        graph.current_entropy = self.current_entropy
+        graph._shared_structure = self._shared_structure = True
+        return graph
     
     def to_dict(self) -> Dict[str, Any]:
         """Export graph as dictionary"""
         return {
-            "nodes": self.nodes,
-            "edges": self.edges
+            "nodes": {node_id: node.to_dict() for node_id, node in self.nodes.items()},
+            "edges": [dict(edge) for edge in self.edges]
         }
 
 
@@ -54,86 +199,144 @@ def find_pivots(
         B: Distance/uncertainty bound
         k: Relaxation depth (number of propagation steps)
     
+    Edge weights are used as distances and are expected to be positive;
+    with zero or negative weights the pivots are not meaningful. Each node
+    counts toward the seed its shortest path starts from, the earliest in
+    seed_set on ties. Nodes improved in the final step are not expanded
+    again, so their descendants stay with the seed of the older path.
+    
     Returns:
         (pivots, working_set) tuple where:
         - pivots: Minimal set of strategic nodes
         - working_set: All nodes reached within bound B
     """
-    # Initialize distances
-    bd = {node_id: float('inf') for node_id in graph.nodes.keys()}
+    node_ids, node_idx, out_idx = graph.index()
+    
+    # Seeds outside the graph have no edges but still belong to W and can pivot
+    missing = [s for s in dict.fromkeys(seed_set) if s not in node_idx]
+    if missing:
+        node_idx = {**node_idx, **{s: len(node_ids) + i for i, s in enumerate(missing)}}
+        node_ids = node_ids + missing
+        out_idx = out_idx + [[] for _ in missing]
+    
+    # Initialize distances; node sets are int bitsets where bit i is node i
+    bd = [math.inf] * len(node_ids)
+    seed_mask = 0
     for s in seed_set:
-        bd[s] = 0.0
-    
-    W = set(seed_set)
-    Wi = set(seed_set)
+        i = node_idx[s]
+        bd[i] = 0.0
+        seed_mask |= 1 << i
+    
+    W = seed_mask
+    Wi = seed_mask
+    # Rank in seed_set of the seed each node's best path starts from (-1
+    # until reached); ties go to the earlier seed, as in a DFS in seed order
+    seeds = list(dict.fromkeys(seed_set))
+    root_of = [-1] * len(node_ids)
+    for rank, s in enumerate(seeds):
+        root_of[node_idx[s]] = rank
+    # Working-set size beyond which the expansion is abandoned
+    limit = k * len(seed_set)
     
     # Relax for k steps
     for i in range(1, k + 1):
-        next_Wi = set()
-        
-        for edge in graph.edges:
-            if edge["from"] in Wi:
-                weight = edge.get("weight", 1.0)
-                candidate = bd[edge["from"]] + weight
-                
-                if candidate <= bd[edge["to"]]:
-                    bd[edge["to"]] = candidate
-                    
-                    if candidate < B:
-                        next_Wi.add(edge["to"])
-                        W.add(edge["to"])
+        next_Wi, over_limit = _relax_step(bd, Wi, out_idx, B, root_of, W, limit)
         
         if not next_Wi:
             break
         
+        W |= next_Wi
         Wi = next_Wi
         
         # Early stopping if expansion too large
-        if len(W) > k * len(seed_set):
-            return set(seed_set), W
-    
-    # Build forest F of relaxed edges
-    F = [
-        e for e in graph.edges
-        if e["from"] in W and e["to"] in W
-        and bd[e["to"]] == bd[e["from"]] + e.get("weight", 1.0)
-    ]
+        if over_limit:
+            return set(seed_set), {node_ids[n] for n in _bits(W)}
     
-    # Group edges into trees by parent
-    children: Dict[str, List[str]] = {}
-    for e in F:
-        if e["from"] not in children:
-            children[e["from"]] = []
-        children[e["from"]].append(e["to"])
+    # Size of each seed's tree in the forest of relaxed edges
+    counts: Dict[int, int] = {}
+    for v in _bits(W):
+        root = root_of[v]
+        counts[root] = counts.get(root, 0) + 1
     
     # Find pivots (roots with >= k vertices)
-    visited = set()
-    pivots = set()
+    pivots = {s for rank, s in enumerate(seeds) if counts.get(rank, 0) >= k}
     
-    for root in seed_set:
-        count = 0
-        stack = [root]
-        
-        while stack:
-            n = stack.pop()
-            if n in visited:
-                continue
-            visited.add(n)
-            count += 1
-            
-            if n in children:
-                stack.extend(children[n])
-        
-        if count >= k:
-            pivots.add(root)
+    return pivots, {node_ids[n] for n in _bits(W)}
+
+
+def _relax_step(
+    bd: List[float],
+    Wi: int,
+    out_idx: List[List[Tuple[int, float]]],
+    B: float,
+    root_of: List[int],
+    W: int,
+    limit: int
+) -> Tuple[int, bool]:
+    """
+    One relaxation step of find_pivots over the frontier Wi
     
-    return pivots, W
+    Updates bd and root_of in place; on equal distances a node keeps the
+    lower seed rank. Returns the bitset of nodes relaxed to a distance
+    below B, and whether W plus those nodes exceeds limit. The step stops
+    at the first new node that takes W past limit, since find_pivots then
+    bails out with the seeds as pivots.
+    """
+    size = W.bit_count()
+    next_Wi = 0
+    for u in _bits(Wi):
+        du = bd[u]
+        for v, weight in out_idx[u]:
+            candidate = du + weight
+            dv = bd[v]
+            
+            if candidate <= dv:
+                if candidate < dv or root_of[u] < root_of[v]:
+                    root_of[v] = root_of[u]
+                bd[v] = candidate
+                
+                if candidate < B:
+                    bit = 1 << v
+                    if not (W | next_Wi) & bit:
+                        size += 1
+                        if size > limit:
+                            return next_Wi | bit, True
+                    next_Wi |= bit
+    
+    return next_Wi, False
+
+
+def _bits(mask: int):
+    """Yield the index of each set bit in mask, lowest first"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+_INV_LN2 = 1.0 / math.log(2.0)
+
+
+def _binary_entropy(p: float) -> float:
+    """Exact Shannon entropy of a Bernoulli(p) variable, in bits"""
+    if p <= 0 or p >= 1:
+        return 0.0
+    # log1p keeps the (1 - p) term accurate as p approaches 1
+    return -(p * math.log(p) + (1 - p) * math.log1p(-p)) * _INV_LN2
+
+
+# Binary entropy sampled at p = i / _ENTROPY_BINS, so lookups need no log2 calls
+_ENTROPY_BINS = 1024
+_ENTROPY_LUT = tuple(_binary_entropy(i / _ENTROPY_BINS) for i in range(_ENTROPY_BINS + 1))
 
 
 def calculate_entropy(p: float) -> float:
     """
     Calculate Shannon entropy for a probability
     
+    Uses a precomputed table with 1/1024 resolution (max error ~0.006 bits),
+    which is ample for ranking and averaging disease uncertainty.
+    
     Args:
         p: Probability (0-1)
     
@@ -142,7 +345,75 @@ def calculate_entropy(p: float) -> float:
     """
     if p <= 0 or p >= 1:
         return 0.0
-    return -p * math.log2(p) - (1 - p) * math.log2(1 - p)
+    return _ENTROPY_LUT[int(p * _ENTROPY_BINS + 0.5)]
+
+
+@functools.lru_cache(maxsize=64)
+def _current_log_odds(
+    symptoms_key: Tuple[Tuple[str, type, Any], ...],
+    patient_key: Tuple[Tuple[str, type, Any], ...]
+) -> Dict[str, float]:
+    """Calculator log-odds for the current context, shared by every candidate"""
+    return compute_log_odds(thaw(symptoms_key), thaw(patient_key))
+
+
+@functools.lru_cache(maxsize=4096)
+def _branch_entropies(
+    calc_symptom: str,
+    symptoms_key: Tuple[Tuple[str, type, Any], ...],
+    patient_key: Tuple[Tuple[str, type, Any], ...]
+) -> Tuple[float, float]:
+    """
+    Posterior entropy if calc_symptom turns out present vs absent
+    
+    Pure in its (hashable) arguments, so results are reused across turns
+    for every candidate whose surrounding context hasn't changed.
+    """
+    return _simulate_branches(
+        calc_symptom,
+        _current_log_odds(symptoms_key, patient_key),
+        thaw(symptoms_key)
+    )
+
+
+def _simulate_branches(
+    calc_symptom: str,
+    log_odds: Dict[str, float],
+    symptoms: Dict[str, Any]
+) -> Tuple[float, float]:
+    """Uncached body of _branch_entropies, given the current log-odds"""
+    # Simulate: What if this symptom is TRUE?
+    if "severity" in calc_symptom:
+        value_if_yes = 70  # Moderate severity
+    elif calc_symptom == "nocturia_per_night":
+        value_if_yes = 3
+    else:
+        value_if_yes = True
+    
+    # Simulate: What if this symptom is FALSE?
+    value_if_no = False if "severity" not in calc_symptom else 0
+    
+    # Both branches only change calc_symptom's points on top of the current log-odds
+    entropy_yes, entropy_no = compute_branch_entropies(
+        log_odds,
+        symptoms,
+        calc_symptom,
+        [value_if_yes, value_if_no]
+    )
+    
+    return entropy_yes, entropy_no
+
+
+# Map graph symptom names to calculator symptom names
+_CALCULATOR_SYMPTOM_MAP = {
+    "pain_burning": "dysuria",
+    "blood_in_urine": "hematuria",
+    "fever": "fever_present",
+}
+
+# Patient used when the caller has no patient info
+_DEFAULT_PATIENT = {"age": 50, "gender": "unknown"}
+_DEFAULT_PATIENT_KEY = freeze(_DEFAULT_PATIENT)
 
 
 def expected_information_gain(
@@ -164,50 +435,32 @@ def expected_information_gain(
     Returns:
         Expected entropy reduction (higher = more informative)
     """
-    from .urology_calculator import compute_urology_differential, calculate_entropy as calc_entropy
-    
-    # Get current entropy from graph metadata
-    current_entropy = graph.nodes.get("_metadata", {}).get("entropy", 2.0)
-    
-    # Map graph symptom names to calculator symptom names
-    symptom_map = {
-        "pain_burning": "dysuria",
-        "blood_in_urine": "hematuria",
-        "fever": "fever_present",
-    }
+    current_entropy = graph.current_entropy
     
     # Get the calculator symptom name
-    calc_symptom = symptom_map.get(symptom_id, symptom_id)
+    calc_symptom = _CALCULATOR_SYMPTOM_MAP.get(symptom_id, symptom_id)
     
     # Prepare current symptoms and patient info for calculator
-    symptoms = current_context or {}
-    patient = patient_info or {"age": 50, "gender": "unknown"}
-    
-    # Simulate: What if this symptom is TRUE?
-    symptoms_if_yes = symptoms.copy()
-    if "severity" in calc_symptom:
-        symptoms_if_yes[calc_symptom] = 70  # Moderate severity
-    elif calc_symptom == "nocturia_per_night":
-        symptoms_if_yes[calc_symptom] = 3
-    else:
-        symptoms_if_yes[calc_symptom] = True
-    
     try:
-        result_yes = compute_urology_differential(symptoms_if_yes, patient)
-        entropy_yes = calc_entropy(result_yes["probabilities"])
-    except Exception as e:
-        print(f"ERROR calculating entropy_yes for {symptom_id}: {e}")
-        return 0.0
-    
-    # Simulate: What if this symptom is FALSE?
-    symptoms_if_no = symptoms.copy()
-    symptoms_if_no[calc_symptom] = False if "severity" not in calc_symptom else 0
+        symptoms_key = freeze(current_context) if current_context else ()
+        patient_key = freeze(patient_info) if patient_info else _DEFAULT_PATIENT_KEY
+        hash((symptoms_key, patient_key))
+    except TypeError:
+        # Unhashable values (e.g. nested dicts) can't be cached
+        symptoms_key = patient_key = None
     
     try:
-        result_no = compute_urology_differential(symptoms_if_no, patient)
-        entropy_no = calc_entropy(result_no["probabilities"])
+        if symptoms_key is None:
+            symptoms = current_context or {}
+            entropy_yes, entropy_no = _simulate_branches(
+                calc_symptom,
+                compute_log_odds(symptoms, patient_info or _DEFAULT_PATIENT),
+                symptoms
+            )
+        else:
+            entropy_yes, entropy_no = _branch_entropies(calc_symptom, symptoms_key, patient_key)
     except Exception as e:
-        print(f"ERROR calculating entropy_no for {symptom_id}: {e}")
+        logger.warning("Error calculating entropy for %s: %s", symptom_id, e)
         return 0.0
     
     # Expected entropy (assume 50/50 yes/no)
@@ -216,7 +469,11 @@ def expected_information_gain(
     # Information gain = reduction in entropy
     gain = current_entropy - expected_entropy
     
-    print(f"DEBUG expected_information_gain: symptom={symptom_id}, current={current_entropy:.3f}, yes={entropy_yes:.3f}, no={entropy_no:.3f}, gain={gain:.3f}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "expected_information_gain: symptom=%s, current=%.3f, yes=%.3f, no=%.3f, gain=%.3f",
+            symptom_id, current_entropy, entropy_yes, entropy_no, gain
+        )
     
     return max(0.0, gain)
 
@@ -235,8 +492,8 @@ def choose_next_question(graph: ProbabilityGraph, working_set: Set[str] = None)
     # Filter to unknown symptoms
     candidates = [
         node_id for node_id, node in graph.nodes.items()
-        if node["type"] == "symptom"
-        and node.get("value") is None
+        if node.type == "symptom"
+        and node.value is None
         and (working_set is None or node_id in working_set)
     ]
     
@@ -272,7 +529,7 @@ def update_graph(
         Updated graph
     """
     if symptom_id in graph.nodes:
-        graph.nodes[symptom_id]["value"] = value
+        graph.nodes[symptom_id].value = value
     
     return graph
 
@@ -292,30 +549,23 @@ def propagate_update(
         Updated graph with propagated probabilities
     """
     symptom = graph.nodes.get(symptom_id)
-    if not symptom or symptom.get("value") is None:
+    if not symptom or symptom.value is None:
         return graph
     
-    symptom_value = symptom["value"]
-    
-    # Find all edges from this symptom
-    connected_edges = [e for e in graph.edges if e["from"] == symptom_id]
+    symptom_value = symptom.value
     
-    for edge in connected_edges:
-        target_id = edge["to"]
+    # Only the edges leaving this symptom
+    for target_id, weight in graph.out_adj.get(symptom_id, ()):
         target = graph.nodes.get(target_id)
         
-        if not target or target["type"] != "disease":
+        if not target or target.type != "disease":
             continue
         
-        weight = edge.get("weight", 0.5)
-        
         # Update probability based on symptom value and edge weight
         delta = weight * symptom_value
-        current_prob = target.get("probability", 0.5)
         
         # Adjust probability (with bounds)
-        new_prob = max(0.0, min(1.0, current_prob + delta - 0.5))
-        graph.nodes[target_id]["probability"] = new_prob
+        target.probability = max(0.0, min(1.0, target.probability + delta - 0.5))
     
     return graph
 
@@ -330,17 +580,15 @@ def get_total_entropy(graph: ProbabilityGraph) -> float:
     Returns:
         Average entropy across diseases
     """
-    disease_nodes = [
-        node for node in graph.nodes.values()
-        if node["type"] == "disease"
-    ]
+    disease_ids = graph.disease_ids
     
-    if not disease_nodes:
+    if not disease_ids:
         return 0.0
     
+    nodes = graph.nodes
     total_entropy = sum(
-        calculate_entropy(node.get("probability", 0.5))
-        for node in disease_nodes
+        calculate_entropy(nodes[node_id].probability)
+        for node_id in disease_ids
     )
     
-    return total_entropy / len(disease_nodes)
+    return total_entropy / len(disease_ids)
@@ -4,8 +4,13 @@ Based on the throat infection calculator approach (differentialCalculations.jsx)
 Uses evidence-based priors and likelihood functions for urological conditions
 """
 
+import functools
+import heapq
 import math
-from typing import Dict, Any, List, Optional
+import sys
+from typing import Dict, Any, List, Optional, Tuple
+
+from cache_keys import freeze, thaw
 
 
 # =============================================================================
@@ -15,48 +20,55 @@ from typing import Dict, Any, List, Optional
 SYMPTOM_KEYWORD_MAP = {
     "sudden_onset": {
         "label": "Sudden onset of symptoms (within hours/days)",
-        "keywords": ["sudden", "acute", "came on quickly", "started yesterday", "overnight", 
-                    "rapid", "all at once", "out of nowhere", "this morning", "few hours"]
+        "keywords": ("sudden", "acute", "came on quickly", "started yesterday", "overnight", 
+                    "rapid", "all at once", "out of nowhere", "this morning", "few hours")
     },
     "gradual_progression": {
         "label": "Gradual onset over weeks/months",
-        "keywords": ["gradual", "slowly", "over time", "getting worse", "progressive", 
-                    "months", "years", "chronic", "been happening for a while"]
+        "keywords": ("gradual", "slowly", "over time", "getting worse", "progressive", 
+                    "months", "years", "chronic", "been happening for a while")
     },
     "dysuria": {
         "label": "Pain or burning when urinating",
-        "keywords": ["pain", "burning", "stinging", "hurts to pee", "painful urination",
-                    "burns when i pee", "dysuria", "discomfort", "sore"]
+        "keywords": ("pain", "burning", "stinging", "hurts to pee", "painful urination",
+                    "burns when i pee", "dysuria", "discomfort", "sore")
     },
     "hematuria": {
         "label": "Blood in urine",
-        "keywords": ["blood", "red urine", "pink urine", "brown urine", "hematuria",
-                    "bloody", "blood in pee", "dark urine", "clots"]
+        "keywords": ("blood", "red urine", "pink urine", "brown urine", "hematuria",
+                    "bloody", "blood in pee", "dark urine", "clots")
     },
     "fever": {
         "label": "Fever, chills, or feeling unwell",
-        "keywords": ["fever", "temperature", "hot", "chills", "shivering", "sweating",
-                    "feeling unwell", "flu-like", "shaking", "malaise"]
+        "keywords": ("fever", "temperature", "hot", "chills", "shivering", "sweating",
+                    "feeling unwell", "flu-like", "shaking", "malaise")
     },
     "weak_stream": {
         "label": "Weak urine stream",
-        "keywords": ["weak stream", "poor flow", "dribbling", "trickle", "slow stream",
-                    "can't pee strongly", "takes ages", "weak flow", "difficulty peeing"]
+        "keywords": ("weak stream", "poor flow", "dribbling", "trickle", "slow stream",
+                    "can't pee strongly", "takes ages", "weak flow", "difficulty peeing")
     },
     "urgency": {
         "label": "Urgent need to urinate",
-        "keywords": ["urgency", "urgent", "can't wait", "sudden urge", "rush to toilet",
-                    "desperate", "need to go now", "can't hold it", "immediate need"]
+        "keywords": ("urgency", "urgent", "can't wait", "sudden urge", "rush to toilet",
+                    "desperate", "need to go now", "can't hold it", "immediate need")
     },
     "nocturia_severe": {
         "label": "Waking to urinate 3+ times per night",
-        "keywords": ["nocturia", "wake up to pee", "nighttime", "3 times a night", 
+        "keywords": ("nocturia", "wake up to pee", "nighttime", "3 times a night", 
                     "waking at night", "up all night", "disturbs sleep", "nocturnal",
                     "get up in the night", "get up at night", "wee at night", "pee at night",
-                    "toilet at night", "bathroom at night", "night time", "during the night"]
+                    "toilet at night", "bathroom at night", "night time", "during the night")
     }
 }
 
+# Flat keyword -> symptom ID index, in SYMPTOM_KEYWORD_MAP order
+SYMPTOM_KEYWORD_INDEX = {
+    keyword: symptom_id
+    for symptom_id, symptom_data in SYMPTOM_KEYWORD_MAP.items()
+    for keyword in symptom_data["keywords"]
+}
+
 # =============================================================================
 # RESEARCH DATA - TO BE FILLED WITH EVIDENCE-BASED VALUES
 # =============================================================================
@@ -210,7 +222,10 @@ SYMPTOM_POINTS = {
 # =============================================================================
 # LIKELIHOOD FUNCTIONS (Like throat calculator's continuous functions)
 # =============================================================================
+# Pure functions of one severity score, so results are memoized: lookahead
+# simulations and repeat turns keep re-scoring the same few severities.
 
+@functools.lru_cache(maxsize=256)
 def calculate_dysuria_uti_likelihood(severity: float) -> float:
     """
     Likelihood of UTI given dysuria severity (0-100 scale)
@@ -229,9 +244,10 @@ def calculate_dysuria_uti_likelihood(severity: float) -> float:
     # Adjusted sigmoid: center at 50, slope 0.18 for reasonable curve
     # At 20: P~0.15, At 50: P~0.5, At 80: P~0.87
     value = 1 / (1 + math.exp(-0.18 * (severity - 50)))
-    return max(0, min(1, value))
+    return value
 
 
+@functools.lru_cache(maxsize=256)
 def calculate_dysuria_noninfectious_likelihood(severity: float) -> float:
     """
     Likelihood of non-infectious causes given dysuria
@@ -244,10 +260,12 @@ def calculate_dysuria_noninfectious_likelihood(severity: float) -> float:
     peak = 0.6
     peak_position = 40
     width = 15
-    value = peak * math.exp(-math.pow(severity - peak_position, 2) / (2 * math.pow(width, 2)))
-    return max(0, min(1, value))
+    d = severity - peak_position
+    value = peak * math.exp(-(d * d) / (2 * width * width))
+    return value
 
 
+@functools.lru_cache(maxsize=256)
 def calculate_weak_stream_bph_likelihood(severity: float) -> float:
     """
     Likelihood of BPH given weak stream severity
@@ -266,12 +284,14 @@ def calculate_weak_stream_bph_likelihood(severity: float) -> float:
     """
     # Adjusted: logistic 0.4 (wider contribution) + Gaussian 0.6 (wider spread to not drop at 100)
     sigmoid = 0.4 / (1 + math.exp(-0.1 * (severity - 35)))  # Shifted midpoint to 35 for earlier rise
-    gaussian = 0.6 * math.exp(-math.pow(severity - 80, 2) / (2 * 500))  # Wider (500 vs 150) to plateau
+    d = severity - 80
+    gaussian = 0.6 * math.exp(-(d * d) / 1000)  # 2 * 500: wider (500 vs 150) to plateau
     # At severity 60: sigmoid ≈0.26, gaussian ≈0.19 → ~0.45
     # At severity 100: sigmoid ≈0.40, gaussian ≈0.45 → ~0.85
-    return max(0, min(1, sigmoid + gaussian))
+    return sigmoid + gaussian  # Both terms >= 0 and their peaks sum to at most 1
 
 
+@functools.lru_cache(maxsize=256)
 def calculate_severe_pain_stones_likelihood(pain: float) -> float:
     """
     Kidney stones cause sudden severe colicky pain
@@ -291,56 +311,90 @@ def calculate_severe_pain_stones_likelihood(pain: float) -> float:
     
     # Steep curve: at 70→~0.5, at 85→~0.95, at 100→~0.998
     value = 1 / (1 + math.exp(-0.3 * (pain - 70)))
-    return max(0, min(1, value))
+    return value
 
 
 # =============================================================================
 # MAIN CALCULATOR
 # =============================================================================
 
+# Ordered by decreasing typical prior, so the likely winners come first
 CONDITIONS = [
+    "bph",
     "uti",
-    "bph", 
-    "prostate_cancer",
     "overactive_bladder",
     "kidney_stones",
+    "prostatitis",
     "interstitial_cystitis",
-    "prostatitis"
+    "prostate_cancer"
 ]
+CONDITIONS = [sys.intern(condition) for condition in CONDITIONS]
+
+# SYMPTOM_POINTS as (condition, points) pairs in CONDITIONS order, restricted to
+# modelled conditions so the scoring loops need no membership checks
+_CONDITION_POINTS = {
+    symptom_key: tuple(
+        (condition, points[condition]) for condition in CONDITIONS if condition in points
+    )
+    for symptom_key, points in SYMPTOM_POINTS.items()
+}
 
 
 def compute_urology_differential(
     symptoms: Dict[str, Any],
-    patient_info: Dict[str, Any]
+    patient_info: Dict[str, Any],
+    debug: bool = False
 ) -> Dict[str, Any]:
     """
     Main Bayesian calculator for urology conditions
     Based on throat calculator approach from differentialCalculations.jsx
     
+    Results are memoized per (symptoms, patient_info); every call returns its
+    own copy, so callers may mutate the graph and other fields freely.
+    
     Args:
         symptoms: Dict of symptom IDs and values
         patient_info: Age, gender, risk factors
+        debug: Also return the posterior log-odds (computed uncached)
     
     Returns:
         Dict with probabilities, recommendations, graph structure, citations
+        (and log_odds when debug is set)
     """
+    if debug:
+        return _differential(symptoms, patient_info, debug=True)
     
-    # Step 1: Set baseline priors from epidemiology
-    priors = _calculate_priors(patient_info)
+    try:
+        key = (freeze(symptoms), freeze(patient_info))
+        hash(key)
+    except TypeError:
+        # Unhashable values (e.g. nested dicts) can't be cached
+        return _differential(symptoms, patient_info)
     
-    # Step 2: Convert to log-odds
-    log_odds = {}
-    for condition in CONDITIONS:
-        p = priors[condition]
-        # Avoid log(0) or log(1)
-        p = max(0.001, min(0.999, p))
-        log_odds[condition] = math.log(p / (1 - p))
+    return _copy_result(_cached_differential(*key))
+
+
+@functools.lru_cache(maxsize=1024)
+def _cached_differential(
+    symptoms_key: Tuple[Tuple[str, type, Any], ...],
+    patient_key: Tuple[Tuple[str, type, Any], ...]
+) -> Dict[str, Any]:
+    """Memoized calculator result; never hand out without _copy_result"""
+    return _differential(thaw(symptoms_key), thaw(patient_key))
+
+
+def _differential(
+    symptoms: Dict[str, Any],
+    patient_info: Dict[str, Any],
+    debug: bool = False
+) -> Dict[str, Any]:
+    """Uncached body of compute_urology_differential"""
     
-    # Step 3: Add discrete symptom points
-    log_odds = _add_discrete_symptoms(log_odds, symptoms)
+    # Steps 1-2: Baseline priors from epidemiology, as log-odds
+    log_odds = _prior_log_odds(patient_info)
     
-    # Step 4: Add continuous symptom likelihoods
-    log_odds = _add_continuous_symptoms(log_odds, symptoms)
+    # Steps 3-4: Add discrete symptom points and continuous symptom likelihoods
+    log_odds = _accumulate_symptom_evidence(log_odds, symptoms)
     
     # Step 5: Softmax to get posterior probabilities
     probabilities = _softmax(log_odds)
@@ -354,19 +408,129 @@ def compute_urology_differential(
     # Step 8: Collect citations
     citations = _collect_citations()
     
-    return {
+    result = {
         "probabilities": probabilities,
         "recommendation": recommendation,
         "graph": graph,
-        "citations": citations,
-        "log_odds": log_odds  # For debugging
+        "citations": citations
+    }
+    if debug:
+        result["log_odds"] = log_odds
+    
+    return result
+
+
+def compute_log_odds(symptoms: Dict[str, Any], patient_info: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Posterior log-odds for the patient's current symptoms
+    
+    Same Bayes update as compute_urology_differential, without the softmax,
+    recommendation, graph or citations. Feed the result to
+    compute_branch_posteriors to simulate answers to one more question.
+    """
+    log_odds = _prior_log_odds(patient_info)
+    return _accumulate_symptom_evidence(log_odds, symptoms)
+
+
+# Symptom keys whose evidence terms read each other (see _symptom_flags)
+_COUPLED_SYMPTOM_KEYS = ("dysuria", "hematuria", "reported_symptoms")
+
+
+def compute_branch_entropies(
+    log_odds: Dict[str, float],
+    symptoms: Dict[str, Any],
+    symptom: str,
+    values: List[Any]
+) -> List[float]:
+    """
+    Posterior entropy if one symptom took each of several values
+    
+    Every evidence term reads a single symptom (or the coupled keys), so a
+    branch is the current log-odds plus the change in that symptom's points;
+    the rest of the evidence is not re-scored, and each branch's entropy is
+    taken straight from its log-odds.
+    
+    Args:
+        log_odds: compute_log_odds(symptoms, patient_info) for the current symptoms
+        symptoms: Current symptom dict
+        symptom: Calculator symptom key being simulated
+        values: Hypothetical values for that symptom (e.g. yes, no)
+    
+    Returns:
+        One entropy (bits) per value, in order
+    """
+    # Dysuria/hematuria points also fire from reported_symptoms, so score those together.
+    # One scratch dict is reused for every branch; only the simulated key changes.
+    scratch = {
+        key: symptoms[key]
+        for key in _COUPLED_SYMPTOM_KEYS
+        if key != symptom and key in symptoms
     }
+    if symptom in symptoms:
+        scratch[symptom] = symptoms[symptom]
+    current_points = _symptom_log_odds(scratch)
+    
+    entropies = []
+    for value in values:
+        scratch[symptom] = value
+        branch_points = _symptom_log_odds(scratch)
+        entropies.append(_log_odds_entropy([
+            lo + branch_points[condition] - current_points[condition]
+            for condition, lo in log_odds.items()
+        ]))
+    
+    return entropies
+
+
+def _symptom_log_odds(symptoms: Dict[str, Any]) -> Dict[str, float]:
+    """Log-odds contributed by the given symptoms alone, without priors"""
+    log_odds = dict.fromkeys(CONDITIONS, 0.0)
+    return _accumulate_symptom_evidence(log_odds, symptoms)
+
+
+def _prior_log_odds(patient_info: Dict[str, Any]) -> Dict[str, float]:
+    """Baseline priors for the patient converted to log-odds"""
+    return dict(_PRIOR_LOG_ODDS_TABLE[_prior_key(patient_info)])
 
 
 def _calculate_priors(patient_info: Dict[str, Any]) -> Dict[str, float]:
     """
     Calculate baseline priors from epidemiology
     Adjusts for age, gender, risk factors
+    
+    Looked up in _PRIOR_TABLE, which _epidemiological_priors fills at import.
+    """
+    return dict(_PRIOR_TABLE[_prior_key(patient_info)])
+
+
+def _prior_key(patient_info: Dict[str, Any]) -> Tuple[str, int, bool, bool]:
+    """The patient's (gender, age band, family history, previous stones) prior table key"""
+    gender = patient_info.get("gender", "unknown")
+    if gender == "male":
+        # Only the male priors depend on age
+        age_band = _age_band(patient_info.get("age", 50))
+    else:
+        age_band = 0
+        if gender != "female":
+            gender = "unknown"
+    
+    return (
+        gender,
+        age_band,
+        bool(patient_info.get("family_history_prostate_cancer")),
+        bool(patient_info.get("previous_kidney_stones"))
+    )
+
+
+def _age_band(age: float) -> int:
+    """Index of the age band the priors distinguish: <50, 50-59, 60-64, 65-69, 70+"""
+    return (age >= 50) + (age >= 60) + (age >= 65) + (age >= 70)
+
+
+def _epidemiological_priors(patient_info: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Baseline priors from epidemiology, evaluated directly
+    Adjusts for age, gender, risk factors
     """
     age = patient_info.get("age", 50)
     gender = patient_info.get("gender", "unknown")
@@ -431,98 +595,189 @@ def _calculate_priors(patient_info: Dict[str, Any]) -> Dict[str, float]:
     return priors
 
 
-def _add_discrete_symptoms(log_odds: Dict[str, float], symptoms: Dict[str, Any]) -> Dict[str, float]:
+# Priors for every (gender, age band, family history, previous stones) combination,
+# using one representative age per band
+_PRIOR_TABLE = {
+    (gender, age_band, family_history, previous_stones): _epidemiological_priors({
+        "gender": gender,
+        "age": age,
+        "family_history_prostate_cancer": family_history,
+        "previous_kidney_stones": previous_stones,
+    })
+    for gender in ("female", "male", "unknown")
+    for age_band, age in enumerate((40, 50, 60, 65, 70))
+    for family_history in (False, True)
+    for previous_stones in (False, True)
+}
+
+
+# Priors are clipped to this range before taking logs, to avoid log(0) or log(1)
+_PRIOR_CLIP = (0.001, 0.999)
+
+
+def _logit(priors: Dict[str, float]) -> Dict[str, float]:
+    """Convert priors to log-odds; only run at import, to build _PRIOR_LOG_ODDS_TABLE"""
+    low, high = _PRIOR_CLIP
+    log_odds = {}
+    for condition in CONDITIONS:
+        p = max(low, min(high, priors[condition]))
+        log_odds[condition] = math.log(p / (1 - p))
+    
+    return log_odds
+
+
+# _PRIOR_TABLE already in log-odds, so the Bayes update starts without any logs
+_PRIOR_LOG_ODDS_TABLE = {key: _logit(priors) for key, priors in _PRIOR_TABLE.items()}
+
+
+def _accumulate_symptom_evidence(log_odds: Dict[str, float], symptoms: Dict[str, Any]) -> Dict[str, float]:
     """
-    Add points for discrete symptoms (like Centor score approach)
+    Add all symptom evidence to log_odds in one pass: points for discrete
+    symptoms (like Centor score approach), then continuous symptom
+    likelihoods (using sigmoid/gaussian functions)
     """
-    # Sudden onset
-    if symptoms.get("onset_speed") == "sudden":
-        for condition in SYMPTOM_POINTS["sudden_onset"]:
-            if condition in log_odds:
-                log_odds[condition] += SYMPTOM_POINTS["sudden_onset"][condition]
-    
-    # Gradual progression
-    if symptoms.get("onset_speed") == "gradual":
-        for condition in SYMPTOM_POINTS["gradual_progression"]:
-            if condition in log_odds:
-                log_odds[condition] += SYMPTOM_POINTS["gradual_progression"][condition]
+    for condition, points in _DISCRETE_POINTS[_symptom_flags(symptoms)]:
+        log_odds[condition] += points
+    
+    for condition, delta in _continuous_deltas(
+        symptoms.get("dysuria_severity", 0),
+        symptoms.get("weak_stream_severity", 0),
+        symptoms.get("pain_severity", 0)
+    ):
+        log_odds[condition] += delta
+    
+    return log_odds
+
+
+# Discrete findings, as bits of the mask built by _symptom_flags
+FLAG_SUDDEN_ONSET = 1 << 0
+FLAG_GRADUAL_PROGRESSION = 1 << 1
+FLAG_DYSURIA = 1 << 2
+FLAG_HEMATURIA = 1 << 3
+FLAG_FEVER = 1 << 4
+FLAG_NO_FEVER = 1 << 5
+FLAG_NOCTURIA_SEVERE = 1 << 6
+
+# (flag, SYMPTOM_POINTS key, sign) in the order the points are applied;
+# fever ABSENT adds the NEGATIVE of the fever points (flip sign)
+_DISCRETE_TERMS = (
+    (FLAG_SUDDEN_ONSET, "sudden_onset", 1),
+    (FLAG_GRADUAL_PROGRESSION, "gradual_progression", 1),
+    (FLAG_DYSURIA, "dysuria", 1),
+    (FLAG_HEMATURIA, "hematuria", 1),
+    (FLAG_FEVER, "fever", 1),
+    (FLAG_NO_FEVER, "fever", -1),
+    (FLAG_NOCTURIA_SEVERE, "nocturia_severe", 1),
+)
+
+
+def _discrete_points(flags: int) -> Tuple[Tuple[str, float], ...]:
+    """Summed _DISCRETE_TERMS points for one flags mask, as (condition, points) pairs"""
+    totals = {}
+    for flag, points_key, sign in _DISCRETE_TERMS:
+        if flags & flag:
+            for condition, points in _CONDITION_POINTS[points_key]:
+                totals[condition] = totals.get(condition, 0.0) + sign * points
+    
+    return tuple((condition, totals[condition]) for condition in CONDITIONS if condition in totals)
+
+
+# Discrete points for every flags mask, indexed by the mask itself, so each
+# update is one lookup plus one add per affected condition
+_DISCRETE_POINTS = tuple(_discrete_points(flags) for flags in range(1 << len(_DISCRETE_TERMS)))
+
+
+def _symptom_flags(symptoms: Dict[str, Any]) -> int:
+    """Normalize the discrete symptom fields into a bitmask of FLAG_* findings"""
+    flags = 0
+    reported = symptoms.get("reported_symptoms", [])
+    
+    # Onset speed
+    onset_speed = symptoms.get("onset_speed")
+    if onset_speed == "sudden":
+        flags |= FLAG_SUDDEN_ONSET
+    elif onset_speed == "gradual":
+        flags |= FLAG_GRADUAL_PROGRESSION
     
     # Dysuria present
-    if symptoms.get("dysuria") or "pain_burning" in symptoms.get("reported_symptoms", []):
-        for condition in SYMPTOM_POINTS["dysuria"]:
-            if condition in log_odds:
-                log_odds[condition] += SYMPTOM_POINTS["dysuria"][condition]
+    if symptoms.get("dysuria") or "pain_burning" in reported:
+        flags |= FLAG_DYSURIA
     
     # Blood in urine
-    if symptoms.get("hematuria") or "blood_in_urine" in symptoms.get("reported_symptoms", []):
-        for condition in SYMPTOM_POINTS["hematuria"]:
-            if condition in log_odds:
-                log_odds[condition] += SYMPTOM_POINTS["hematuria"][condition]
-    
-    # Fever
-    if symptoms.get("fever_present"):
-        # Fever PRESENT: add positive points
-        for condition in SYMPTOM_POINTS["fever"]:
-            if condition in log_odds:
-                log_odds[condition] += SYMPTOM_POINTS["fever"][condition]
-    elif symptoms.get("fever_present") is False:
-        # Fever ABSENT: add NEGATIVE of points (flip sign)
-        for condition in SYMPTOM_POINTS["fever"]:
-            if condition in log_odds:
-                log_odds[condition] -= SYMPTOM_POINTS["fever"][condition]  # Subtract = flip sign
+    if symptoms.get("hematuria") or "blood_in_urine" in reported:
+        flags |= FLAG_HEMATURIA
+    
+    # Fever, recorded as present or explicitly absent
+    fever_present = symptoms.get("fever_present")
+    if fever_present:
+        flags |= FLAG_FEVER
+    elif fever_present is False:
+        flags |= FLAG_NO_FEVER
     
     # Severe nocturia
-    nocturia_count = symptoms.get("nocturia_per_night", 0)
-    if nocturia_count >= 3:
-        for condition in SYMPTOM_POINTS["nocturia_severe"]:
-            if condition in log_odds:
-                log_odds[condition] += SYMPTOM_POINTS["nocturia_severe"][condition]
+    if symptoms.get("nocturia_per_night", 0) >= 3:
+        flags |= FLAG_NOCTURIA_SEVERE
     
-    return log_odds
+    return flags
 
 
-def _add_continuous_symptoms(log_odds: Dict[str, float], symptoms: Dict[str, Any]) -> Dict[str, float]:
+@functools.lru_cache(maxsize=1024)
+def _continuous_deltas(
+    dysuria_severity: float,
+    weak_stream_severity: float,
+    pain_severity: float
+) -> Tuple[Tuple[str, float], ...]:
     """
-    Add continuous symptom likelihoods (using sigmoid/gaussian functions)
+    Log-odds changes from the three continuous severities, as (condition, delta)
+    pairs in application order; depends only on the severities, so memoized
     """
+    deltas = []
+    
     # Dysuria severity
-    dysuria_severity = symptoms.get("dysuria_severity", 0)
     if dysuria_severity > 0:
         uti_likelihood = calculate_dysuria_uti_likelihood(dysuria_severity)
         non_infectious_likelihood = calculate_dysuria_noninfectious_likelihood(dysuria_severity)
         
         # Add log ratio (like throat calculator)
-        safe_uti = max(uti_likelihood, 0.0001)
-        safe_other = max(non_infectious_likelihood, 0.0001)
-        log_ratio = math.log(safe_uti / safe_other)
+        log_ratio = _log_likelihood(uti_likelihood) - _log_likelihood(non_infectious_likelihood)
         
-        log_odds["uti"] += log_ratio * 0.5
-        log_odds["prostatitis"] += log_ratio * 0.3
-        log_odds["bph"] -= log_ratio * 0.3
+        deltas.append(("uti", log_ratio * 0.5))
+        deltas.append(("prostatitis", log_ratio * 0.3))
+        deltas.append(("bph", -(log_ratio * 0.3)))
     
     # Weak stream severity
-    weak_stream_severity = symptoms.get("weak_stream_severity", 0)
     if weak_stream_severity > 0:
         bph_likelihood = calculate_weak_stream_bph_likelihood(weak_stream_severity)
-        log_odds["bph"] += math.log(max(bph_likelihood, 0.0001)) * 0.5
-        log_odds["prostate_cancer"] += math.log(max(bph_likelihood * 0.7, 0.0001)) * 0.3
+        deltas.append(("bph", _log_likelihood(bph_likelihood) * 0.5))
+        deltas.append(("prostate_cancer", _log_likelihood(bph_likelihood * 0.7) * 0.3))
     
     # Severe pain
-    pain_severity = symptoms.get("pain_severity", 0)
     if pain_severity > 70:
         stones_likelihood = calculate_severe_pain_stones_likelihood(pain_severity)
-        log_odds["kidney_stones"] += math.log(max(stones_likelihood, 0.0001)) * 0.7
+        deltas.append(("kidney_stones", _log_likelihood(stones_likelihood) * 0.7))
     
-    return log_odds
+    return tuple(deltas)
+
+
+# Likelihoods are floored at 0.0001 before taking logs
+_LOG_LIKELIHOOD_FLOOR = math.log(0.0001)
+
+
+def _log_likelihood(likelihood: float) -> float:
+    """Log of a likelihood, floored so near-zero values stay finite"""
+    if likelihood <= 0.0001:
+        return _LOG_LIKELIHOOD_FLOOR
+    return math.log(likelihood)
 
 
 def _softmax(log_odds: Dict[str, float]) -> Dict[str, float]:
     """Convert log-odds to probabilities using softmax"""
-    exp_odds = {cond: math.exp(lo) for cond, lo in log_odds.items()}
-    sum_exp = sum(exp_odds.values())
+    # Shift by the max so large symptom totals can't overflow math.exp
+    shift = max(log_odds.values())
+    exp_odds = [math.exp(lo - shift) for lo in log_odds.values()]
+    inv_sum = 1.0 / sum(exp_odds)
     
-    probabilities = {cond: exp_val / sum_exp for cond, exp_val in exp_odds.items()}
-    return probabilities
+    return {cond: exp_val * inv_sum for cond, exp_val in zip(log_odds, exp_odds)}
 
 
 def _make_clinical_recommendation(
@@ -536,7 +791,8 @@ def _make_clinical_recommendation(
     
     TODO: RESEARCH - Get clinical thresholds from guidelines
     """
-    sorted_conditions = sorted(probabilities.items(), key=lambda x: x[1], reverse=True)
+    # Only the top two are used; nlargest matches sorted(..., reverse=True)[:2], ties included
+    sorted_conditions = heapq.nlargest(2, probabilities.items(), key=lambda x: x[1])
     top_condition, top_prob = sorted_conditions[0]
     
     # TODO: Get these thresholds from NICE/EAU/AUA guidelines
@@ -612,45 +868,60 @@ def _build_graph_structure(probabilities: Dict[str, float], symptoms: Dict[str,
     """
     Build graph structure compatible with FindPivots algorithm
     """
-    graph = {
-        "nodes": {},
-        "edges": []
-    }
+    # Node dicts are built as single literals into a local map; the graph is
+    # plain dicts because it is serialized and reloaded by ProbabilityGraph.from_dict
+    nodes = {}
     
     # Add disease nodes
     for condition, prob in probabilities.items():
-        disease_id = f"uro_{condition}"
-        graph["nodes"][disease_id] = {
-            "type": "disease",
-            "probability": prob,
-            "label": condition.replace("_", " ").title()
-        }
+        disease_id, label = _DISEASE_NODES[condition]
+        nodes[disease_id] = {"type": "disease", "probability": prob, "label": label}
     
     # Add symptom nodes (observed and unobserved)
-    all_possible_symptoms = [
+    reported = set(symptoms.get("reported_symptoms", []))
+    for symptom_id, absent_id, label in _SYMPTOM_NODES:
+        # Observed, reported absent, or not yet asked
+        if symptom_id in reported:
+            value = 1.0
+        elif absent_id in reported:
+            value = 0.0
+        else:
+            value = None
+        
+        nodes[symptom_id] = {"type": "symptom", "value": value, "label": label}
+    
+    return {
+        "nodes": nodes,
+        "edges": [dict(edge) for edge in _GRAPH_EDGES]
+    }
+
+
+# Graph skeleton shared by every _build_graph_structure call
+
+# Generated IDs are interned so graph lookups downstream hit dict identity checks
+
+# condition -> (disease node ID, label)
+_DISEASE_NODES = {
+    condition: (sys.intern(f"uro_{condition}"), condition.replace("_", " ").title())
+    for condition in CONDITIONS
+}
+
+# (symptom node ID, "reported absent" ID, label) for observed and unobserved symptoms
+_SYMPTOM_NODES = tuple(
+    (sys.intern(symptom_id), f"no_{symptom_id}", symptom_id.replace("_", " ").title())
+    for symptom_id in [
         "weak_stream", "urgency", "frequency", "nocturia", 
         "incomplete_emptying", "hesitancy", "straining",
         "pain_burning", "dysuria", "blood_in_urine",
         "fever", "severe_pain", "pelvic_pain"
     ]
-    
-    for symptom_id in all_possible_symptoms:
-        # Check if symptom was observed
-        value = None
-        if symptom_id in symptoms.get("reported_symptoms", []):
-            value = 1.0
-        elif f"no_{symptom_id}" in symptoms.get("reported_symptoms", []):
-            value = 0.0
-        
-        graph["nodes"][symptom_id] = {
-            "type": "symptom",
-            "value": value,
-            "label": symptom_id.replace("_", " ").title()
-        }
-    
-    # Add edges (symptom -> disease with weights)
-    # TODO: RESEARCH - Get these weights from sensitivity/specificity studies
-    edge_weights = {
+)
+
+# Edges (symptom -> disease with weights); copied per graph by _build_graph_structure
+# TODO: RESEARCH - Get these weights from sensitivity/specificity studies
+_GRAPH_EDGES = tuple(
+    {"from": symptom, "to": disease, "weight": weight}
+    for (symptom, disease), weight in {
         ("weak_stream", "uro_bph"): 0.95,
         ("weak_stream", "uro_prostate_cancer"): 0.75,
         ("urgency", "uro_uti"): 0.90,
@@ -661,41 +932,70 @@ def _build_graph_structure(probabilities: Dict[str, float], symptoms: Dict[str,
         ("fever", "uro_uti"): 0.85,
         ("fever", "uro_prostatitis"): 0.90,
         # ... etc
-    }
-    
-    for (symptom, disease), weight in edge_weights.items():
-        graph["edges"].append({
-            "from": symptom,
-            "to": disease,
-            "weight": weight
-        })
-    
-    return graph
+    }.items()
+)
 
 
 def _collect_citations() -> List[str]:
     """Collect all citations used in calculation"""
-    citations = []
-    
-    for prior_data in UROLOGY_PRIORS.values():
-        if isinstance(prior_data, dict) and "citation" in prior_data:
-            citations.append(prior_data["citation"])
-    
-    for symptom_data in SYMPTOM_POINTS.values():
-        if "citation" in symptom_data:
-            citations.append(symptom_data["citation"])
-    
-    return list(set(citations))  # Remove duplicates
+    return list(_CITATIONS)
+
+
+# Citations from the (constant) priors and symptom points, deduplicated once at import
+_CITATIONS = tuple(dict.fromkeys(
+    data["citation"]
+    for data in (*UROLOGY_PRIORS.values(), *SYMPTOM_POINTS.values())
+    if isinstance(data, dict) and "citation" in data
+))
 
 
 # =============================================================================
 # HELPER FUNCTIONS
 # =============================================================================
 
+def _copy_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a calculator result down to the containers callers mutate"""
+    graph = result["graph"]
+    return {
+        "probabilities": dict(result["probabilities"]),
+        "recommendation": {
+            key: list(value) if isinstance(value, list) else value
+            for key, value in result["recommendation"].items()
+        },
+        "graph": {
+            "nodes": {node_id: dict(node) for node_id, node in graph["nodes"].items()},
+            "edges": [dict(edge) for edge in graph["edges"]]
+        },
+        "citations": list(result["citations"])
+    }
+
+
+_INV_LN2 = 1.0 / math.log(2.0)
+
+
+def _log_odds_entropy(log_odds: List[float]) -> float:
+    """
+    Shannon entropy of softmax(log_odds), without building the probabilities
+    
+    With z = log_odds - max(log_odds) and Z = sum(exp(z)),
+    H = ln Z - sum(exp(z) * z) / Z nats.
+    """
+    shift = max(log_odds)
+    total = 0.0
+    weighted = 0.0
+    for lo in log_odds:
+        z = lo - shift
+        e = math.exp(z)
+        total += e
+        weighted += e * z
+    return (math.log(total) - weighted / total) * _INV_LN2
+
+
 def calculate_entropy(probabilities: Dict[str, float]) -> float:
     """Calculate Shannon entropy of probability distribution"""
     entropy = 0
     for prob in probabilities.values():
         if prob > 0:
-            entropy -= prob * math.log2(prob)
-    return entropy
+            entropy -= prob * math.log(prob)
+    # Natural-log sum converted to bits once
+    return entropy * _INV_LN2
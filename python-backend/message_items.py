@@ -8,24 +8,38 @@ with Pydantic validation and `model_dump()` output.
 If you later need more advanced behaviour (e.g., metadata, status fields),
 you can safely extend this model without changing the public interface.
 """
+from dataclasses import asdict
 from typing import Literal, List, Dict, Any, Union
 
-from pydantic import BaseModel, Field
+from pydantic import ConfigDict, Field, TypeAdapter
+from pydantic.dataclasses import dataclass
 
 
-class MessageInputItem(BaseModel):
+@dataclass(
+    slots=True,
+    frozen=True,
+    kw_only=True,
+    config=ConfigDict(extra="forbid", populate_by_name=True),
+)
+class MessageInputItem:
     """Represents a single user / system message fed *into* the agent runner.
 
     Only two attributes are currently required by ``api.py``:
       • ``role``   – "user", "system", or "developer" (defaults to "user")
       • ``content`` – either a raw string or a list/dict structure accepted by
         OpenAI's Responses API.  We keep this flexible via ``Union``.
+
+    A slotted Pydantic dataclass: validated like a model, but without a
+    per-instance ``__dict__``.
     """
 
     role: Literal["user", "system", "developer"] = Field("user", description="Message role recognised by the Runner")
     content: Union[str, List[Dict[str, Any]]] = Field(..., description="Message content; plain text or rich content list")
 
-    model_config = {
-        "extra": "forbid",
-        "populate_by_name": True,
-    }
+    def model_dump(self) -> Dict[str, Any]:
+        """Plain-dict form, matching the former BaseModel.model_dump() output."""
+        return asdict(self)
+
+
+# Validates a whole message history in one pydantic-core call; built once at import
+MESSAGE_LIST_ADAPTER = TypeAdapter(List[MessageInputItem])
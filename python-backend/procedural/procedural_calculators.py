@@ -6,16 +6,85 @@ Based on clinical_graph YAML specs and surgical intake form
 
 import math
 from typing import Dict, Any, List, Optional
-from dataclasses import dataclass
 
-@dataclass
-class CriterionMatch:
-    """Represents a matched criterion with evidence"""
-    label: str
-    score_contribution: float
-    evidence: str
-    feature_value: Any
-    threshold: float
+
+def _prepare_criterion(crit: Dict[str, Any]) -> Dict[str, Any]:
+    """Add the criterion's fixed log-odds contribution, weight + log10(LR), and
+    its match label (default "FEATURE ≥ threshold")"""
+    return {
+        "label": f"{crit['feature']} ≥ {crit['threshold']}",
+        **crit,
+        "contribution": crit["weight"] + math.log10(crit["lr"]),
+    }
+
+
+# Evidence-tagged criteria from biopsy.yaml, in calculate_mri_fusion_indication argument order
+_MRI_FUSION_CRITERIA = tuple(map(_prepare_criterion, (
+    {
+        "feature": "PIRADS",
+        "threshold": 4,
+        "lr": 3.2,
+        "weight": 1.3,
+        "evidence": "EAU-2025-PI-RADS",
+    },
+    {
+        "feature": "PSAD",
+        "threshold": 0.15,
+        "lr": 2.5,
+        "weight": 1.0,
+        "evidence": "NICE-NG131-2024",
+    },
+    {
+        "feature": "PSAV",
+        "threshold": 1.5,
+        "lr": 1.8,
+        "weight": 0.6,
+        "evidence": "Carter-JAMA-2021",
+    },
+    {
+        "feature": "LESION",
+        "threshold": 8,
+        "lr": 1.7,
+        "weight": 0.5,
+        "evidence": "Radiology-2020-Mehralivand",
+    },
+)))
+
+# Evidence-tagged criteria from hifu.yaml, in calculate_hifu_eligibility argument order
+_HIFU_CRITERIA = tuple(map(_prepare_criterion, (
+    {
+        "feature": "PIRADS",
+        "threshold": 4,
+        "lr": 1.6,
+        "weight": 0.6,
+        "evidence": "EAU-2023",
+    },
+    {
+        "feature": "LESION",
+        "threshold": 8,
+        "lr": 1.9,
+        "weight": 0.8,
+        "evidence": "Ahmed-2021-LancetOnc",
+    },
+    {
+        "feature": "GLEASON_MAX",
+        "threshold": 7,
+        "lr": 2.1,
+        "weight": 0.9,
+        "evidence": "EAU-2023",
+        "label": "GLEASON_MAX suitable",
+    },
+)))
+
+
+# Gleason grade strings as numeric scores; anything else is treated as 7
+_GLEASON_NUMERIC = {"3+3": 6, "3+4": 7, "4+3": 7, ">=8": 8, "8": 8, "9": 9, "10": 10}
+
+# Gleason progression-risk multipliers for active surveillance; others leave the LR unchanged
+_GLEASON_PROGRESSION_LR = {
+    "4+3": 2.0, ">=8": 2.0, "8": 2.0, "9": 2.0, "10": 2.0,
+    "3+3": 0.7,  # Lower risk
+}
 
 
 def calculate_mri_fusion_indication(
@@ -32,60 +101,23 @@ def calculate_mri_fusion_indication(
     Returns scoring with evidence citations
     """
     
-    # Evidence-tagged criteria from biopsy.yaml
-    criteria = [
-        {
-            "feature": "PIRADS",
-            "threshold": 4,
-            "lr": 3.2,
-            "weight": 1.3,
-            "evidence": "EAU-2025-PI-RADS",
-            "value": pirads
-        },
-        {
-            "feature": "PSAD",
-            "threshold": 0.15,
-            "lr": 2.5,
-            "weight": 1.0,
-            "evidence": "NICE-NG131-2024",
-            "value": psad
-        },
-        {
-            "feature": "PSAV",
-            "threshold": 1.5,
-            "lr": 1.8,
-            "weight": 0.6,
-            "evidence": "Carter-JAMA-2021",
-            "value": psa_velocity
-        },
-        {
-            "feature": "LESION",
-            "threshold": 8,
-            "lr": 1.7,
-            "weight": 0.5,
-            "evidence": "Radiology-2020-Mehralivand",
-            "value": lesion_size_mm
-        }
-    ]
-    
     # Calculate score
     base_score = 1.0
     matched_criteria = []
     
-    for crit in criteria:
-        value = crit["value"]
+    values = (pirads, psad, psa_velocity, lesion_size_mm)
+    for crit, value in zip(_MRI_FUSION_CRITERIA, values):
         if value is not None and value >= crit["threshold"]:
             # Log-odds contribution: weight + log10(LR)
-            contribution = crit["weight"] + math.log10(crit["lr"])
+            contribution = crit["contribution"]
             base_score += contribution
             
-            matched_criteria.append(CriterionMatch(
-                label=f"{crit['feature']} ≥ {crit['threshold']}",
-                score_contribution=round(contribution, 2),
-                evidence=crit["evidence"],
-                feature_value=value,
-                threshold=crit["threshold"]
-            ))
+            matched_criteria.append({
+                "label": crit["label"],
+                "contribution": round(contribution, 2),
+                "evidence": crit["evidence"],
+                "value": value
+            })
     
     # Thresholds from spec
     thresholds = {"score_low": 0.5, "score_high": 1.5}
@@ -109,15 +141,7 @@ def calculate_mri_fusion_indication(
         "raw_score": round(base_score, 3),
         "band": band,
         "recommendation": recommendation,
-        "matched_criteria": [
-            {
-                "label": m.label,
-                "contribution": m.score_contribution,
-                "evidence": m.evidence,
-                "value": m.feature_value
-            }
-            for m in matched_criteria
-        ],
+        "matched_criteria": matched_criteria,
         "thresholds": thresholds,
         "site_block": site_block,
         "consent_template": "Consent_Biopsy@v1.1" if band in ["strong", "consider"] else None,
@@ -139,40 +163,12 @@ def calculate_hifu_eligibility(
     Returns scoring with evidence citations and contraindications
     """
     
-    # Evidence-tagged criteria from hifu.yaml
-    criteria = [
-        {
-            "feature": "PIRADS",
-            "threshold": 4,
-            "lr": 1.6,
-            "weight": 0.6,
-            "evidence": "EAU-2023",
-            "value": pirads
-        },
-        {
-            "feature": "LESION",
-            "threshold": 8,
-            "lr": 1.9,
-            "weight": 0.8,
-            "evidence": "Ahmed-2021-LancetOnc",
-            "value": lesion_size_mm
-        },
-        {
-            "feature": "GLEASON_MAX",
-            "threshold": 7,
-            "lr": 2.1,
-            "weight": 0.9,
-            "evidence": "EAU-2023",
-            "value": _gleason_to_numeric(gleason_score)
-        }
-    ]
-    
     # Calculate base score
     base_score = 1.0
     matched_criteria = []
     
-    for crit in criteria:
-        value = crit["value"]
+    values = (pirads, lesion_size_mm, _gleason_to_numeric(gleason_score))
+    for crit, value in zip(_HIFU_CRITERIA, values):
         if value is not None:
             # Special handling for Gleason (≤7 means suitable)
             if crit["feature"] == "GLEASON_MAX":
@@ -181,11 +177,11 @@ def calculate_hifu_eligibility(
                 meets_threshold = value >= crit["threshold"]
             
             if meets_threshold:
-                contribution = crit["weight"] + math.log10(crit["lr"])
+                contribution = crit["contribution"]
                 base_score += contribution
                 
                 matched_criteria.append({
-                    "label": f"{crit['feature']} suitable" if crit["feature"] == "GLEASON_MAX" else f"{crit['feature']} ≥ {crit['threshold']}",
+                    "label": crit["label"],
                     "contribution": round(contribution, 2),
                     "evidence": crit["evidence"],
                     "value": value
@@ -268,10 +264,7 @@ def calculate_active_surveillance_vs_surgery(
         progression_lr *= 2.0  # NICE flag
     if pirads >= 5:
         progression_lr *= 1.5
-    if gleason_score in ["4+3", ">=8", "8", "9", "10"]:
-        progression_lr *= 2.0
-    if gleason_score == "3+3":
-        progression_lr *= 0.7  # Lower risk
+    progression_lr *= _GLEASON_PROGRESSION_LR.get(gleason_score, 1.0)
     
     as_harm = 0.15 * (progression_lr - 1)
     as_preference = 0.25 * patient_preferences.get("avoid_overtreatment", 0.5)
@@ -330,15 +323,7 @@ def calculate_active_surveillance_vs_surgery(
 
 def _gleason_to_numeric(gleason: str) -> int:
     """Convert Gleason string to numeric for comparison"""
-    if gleason == "3+3":
-        return 6
-    elif gleason == "3+4":
-        return 7
-    elif gleason == "4+3":
-        return 7
-    elif gleason in [">=8", "8", "9", "10"]:
-        return int(gleason.replace(">=", ""))
-    return 7  # Default
+    return _GLEASON_NUMERIC.get(gleason, 7)  # Default 7
 
 
 def generate_treatment_summary(
@@ -352,6 +337,10 @@ def generate_treatment_summary(
     Used by Treatment Agent for patient education and booking
     """
     
+    # Evidence citations from each calculator's matched criteria
+    mri_evidence = [m["evidence"] for m in mri_fusion_result["matched_criteria"]]
+    hifu_evidence = [m["evidence"] for m in hifu_result["matched_criteria"]]
+    
     # Determine primary pathway
     pathways = []
     
@@ -360,7 +349,7 @@ def generate_treatment_summary(
             "name": "MRI Fusion Biopsy",
             "priority": "high" if mri_fusion_result["band"] == "strong" else "medium",
             "urgency": mri_fusion_result["urgency"],
-            "evidence": [m["evidence"] for m in mri_fusion_result["matched_criteria"]],
+            "evidence": mri_evidence,
             "next_steps": [
                 "Book biopsy appointment",
                 "Discuss anticoagulant management if applicable",
@@ -376,7 +365,7 @@ def generate_treatment_summary(
             "priority": "medium",
             "urgency": hifu_result["urgency"],
             "cost_estimate_gbp": hifu_result.get("estimated_cost_gbp"),
-            "evidence": [m["evidence"] for m in hifu_result["matched_criteria"]],
+            "evidence": hifu_evidence,
             "next_steps": [
                 "Specialist urology consultation required",
                 "Discuss procedure risks and benefits",
@@ -428,20 +417,22 @@ def generate_treatment_summary(
             "confidence": "moderate" if pathways else "low"
         },
         "patient_email_content": _generate_patient_email(pathways, patient_data),
-        "clinical_summary": _generate_clinical_summary(pathways, patient_data, mri_fusion_result, hifu_result)
+        "clinical_summary": _generate_clinical_summary(pathways, patient_data, mri_fusion_result, hifu_result, mri_evidence)
     }
 
 
+# Booking windows by pathway urgency, most urgent first
+_URGENCY_BOOKING = (("urgent", "within_2_weeks"), ("routine", "within_6_weeks"))
+
+
 def _determine_booking_timing(pathways: List[Dict]) -> str:
     """Determine when to book based on pathway urgencies"""
-    urgencies = [p["urgency"] for p in pathways]
+    urgencies = {p["urgency"] for p in pathways}
     
-    if "urgent" in urgencies:
-        return "within_2_weeks"
-    elif "routine" in urgencies:
-        return "within_6_weeks"
-    else:
-        return "elective_3_6_months"
+    for urgency, timing in _URGENCY_BOOKING:
+        if urgency in urgencies:
+            return timing
+    return "elective_3_6_months"
 
 
 def _determine_theatre_priority(pathways: List[Dict], patient_data: Dict) -> str:
@@ -485,24 +476,13 @@ def _assess_patient_readiness(patient_data: Dict, pathways: List[Dict]) -> Dict[
     }
 
 
-def _generate_patient_email(pathways: List[Dict], patient_data: Dict) -> str:
-    """Generate patient-friendly email content"""
-    
-    content = f"""Dear Patient,
+_PATIENT_EMAIL_HEADER = """Dear Patient,
 
 Thank you for discussing your prostate health with us. Based on our conversation, here's what we recommend:
 
 """
-    
-    for i, pathway in enumerate(pathways, 1):
-        content += f"""
-{i}. {pathway['name']}
-   Why: Based on your PSA levels, MRI findings, and personal preferences
-   Next steps: {', '.join(pathway['next_steps'][:2])}
-   Timing: {pathway['urgency'].replace('_', ' ').title()}
-"""
-    
-    content += """
+
+_PATIENT_EMAIL_FOOTER = """
 
 What This Means For You:
 - These recommendations are designed to give you options, not prescribe a single path
@@ -519,18 +499,37 @@ Questions? Reply to this email or call our clinic.
 Best regards,
 Your Urology Team
 """
+
+
+def _generate_patient_email(pathways: List[Dict], patient_data: Dict) -> str:
+    """Generate patient-friendly email content"""
+    
+    parts = [_PATIENT_EMAIL_HEADER]
+    
+    for i, pathway in enumerate(pathways, 1):
+        parts.append(f"""
+{i}. {pathway['name']}
+   Why: Based on your PSA levels, MRI findings, and personal preferences
+   Next steps: {', '.join(pathway['next_steps'][:2])}
+   Timing: {pathway['urgency'].replace('_', ' ').title()}
+""")
     
-    return content
+    parts.append(_PATIENT_EMAIL_FOOTER)
+    
+    return "".join(parts)
 
 
 def _generate_clinical_summary(
     pathways: List[Dict],
     patient_data: Dict,
     mri_result: Dict,
-    hifu_result: Dict
+    hifu_result: Dict,
+    mri_evidence: List[str]
 ) -> str:
     """Generate clinical summary for EMR (de-identified)"""
     
+    pathway_lines = "\n".join(f"- {p['name']} ({p['priority']} priority)" for p in pathways)
+    
     return f"""CLINICAL DECISION SUPPORT SUMMARY
 
 Assessment Date: [AUTO-GENERATED]
@@ -545,14 +544,14 @@ Patient Profile:
 
 MRI Fusion Biopsy Indication: {mri_result['band'].upper()}
 - Score: {mri_result['raw_score']}
-- Evidence: {', '.join([m['evidence'] for m in mri_result['matched_criteria']])}
+- Evidence: {', '.join(mri_evidence)}
 
 HIFU Eligibility: {hifu_result['band'].upper()}
 - Score: {hifu_result['raw_score']}
 - Contraindications: {'Large prostate >60cc' if hifu_result['contraindications']['large_prostate_gt60cc'] else 'None identified'}
 
 Recommended Pathways:
-{chr(10).join([f"- {p['name']} ({p['priority']} priority)" for p in pathways])}
+{pathway_lines}
 
 Decision Support Algorithm Version: 2.0
 Evidence Base: EAU 2023-2025, NICE NG131-2024, Ahmed 2021
@@ -4,28 +4,58 @@ Deterministic, explainable scoring for surgical/procedural pathways
 Clinical graphs stored in YAML (versioned, auditable)
 """
 
+import functools
 import math
 import yaml
 from pathlib import Path
 from typing import Dict, Any, List, Tuple
 
+from cache_keys import freeze, thaw
+
 
 CLINICAL_GRAPH_DIR = Path(__file__).parent.parent / "clinical_graph"
 
+# libyaml's C loader when PyYAML was built with it
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Parsed calculators by name; the YAML files are read once per process
+_CALC_CACHE: Dict[str, Dict[str, Any]] = {}
+
 
 def load_calculator(calc_name: str) -> Dict[str, Any]:
     """
     Load a clinical calculator from YAML
     
+    The parsed calculator is cached and shared between callers, so treat it
+    as read-only.
+    
     Args:
         calc_name: Name of calculator file (e.g., "biopsy", "hifu")
         
     Returns:
         Dict with calculator configuration
     """
-    calc_path = CLINICAL_GRAPH_DIR / f"{calc_name}.yaml"
-    with open(calc_path, "r") as f:
-        return yaml.safe_load(f)
+    calc = _CALC_CACHE.get(calc_name)
+    if calc is None:
+        calc_path = CLINICAL_GRAPH_DIR / f"{calc_name}.yaml"
+        with open(calc_path, "r") as f:
+            calc = yaml.load(f, Loader=_YAML_LOADER)
+        _prepare_calculator(calc)
+        _CALC_CACHE[calc_name] = calc
+    return calc
+
+
+def _prepare_calculator(calc_yaml: Dict[str, Any]) -> None:
+    """Pre-compute decision outputs and each support's LR, threshold and weight once at load time"""
+    decisions = calc_yaml.get("decisions", [])
+    calc_yaml["_out_w"] = max((d.get("output_weight", 0.0) for d in decisions), default=0.0)
+    calc_yaml["_decision_name"] = decisions[0]["name"] if decisions else None
+    calc_yaml["_consent_template"] = decisions[0].get("consent_template") if decisions else None
+    for crit in calc_yaml.get("criteria", []):
+        for s in crit.get("supports", []):
+            s["_log_lr"] = math.log10(float(s["lr"]))
+            s["_threshold_f"] = float(s["threshold"])
+            s["_weight_f"] = float(s.get("weight", 0.0))
 
 
 def feature_meets(feature_name: str, patient_value: Any, threshold: float) -> bool:
@@ -67,16 +97,28 @@ def score_calculator(calc_yaml: Dict[str, Any], features: Dict[str, Any]) -> Dic
     Returns:
         Dict with score, evidence hits, and thresholds
     """
-    # Multiply LRs for met supports; sum weights; add decision output_weight
-    lr_prod = 1.0
+    if "_out_w" not in calc_yaml:
+        # Calculator not loaded through load_calculator; prepare a copy so the
+        # caller's dict and its supports are left untouched
+        calc_yaml = {
+            **calc_yaml,
+            "criteria": [
+                {**crit, "supports": [dict(s) for s in crit.get("supports", [])]}
+                for crit in calc_yaml.get("criteria", [])
+            ],
+        }
+        _prepare_calculator(calc_yaml)
+    
+    # Sum log10 LRs and weights for met supports; add decision output_weight
+    log_lr_sum = 0.0
     w_sum = 0.0
     hit = []
     
     for crit in calc_yaml.get("criteria", []):
         for s in crit.get("supports", []):
-            if feature_meets(s["feature"], features.get(s["feature"]), s["threshold"]):
-                lr_prod *= float(s["lr"])
-                w_sum += float(s.get("weight", 0.0))
+            if feature_meets(s["feature"], features.get(s["feature"]), s["_threshold_f"]):
+                log_lr_sum += s["_log_lr"]
+                w_sum += s["_weight_f"]
                 hit.append({
                     "feature": s["feature"],
                     "threshold": s["threshold"],
@@ -86,19 +128,15 @@ def score_calculator(calc_yaml: Dict[str, Any], features: Dict[str, Any]) -> Dic
                     "evidence": s["evidence"]
                 })
     
-    # Add output weight from decision
-    decisions = calc_yaml.get("decisions", [])
-    out_w = max(d.get("output_weight", 0.0) for d in decisions) if decisions else 0.0
-    
-    # Calculate soft score: log10(LR product) + weight sum + output weight
-    soft_score = math.log10(lr_prod) + w_sum + out_w
+    # Calculate soft score: log10(LR product) + weight sum + decision output weight
+    soft_score = log_lr_sum + w_sum + calc_yaml["_out_w"]
     
     return {
         "score": round(soft_score, 3),
         "hits": hit,
         "thresholds": calc_yaml.get("thresholds", {}),
-        "decision_name": decisions[0]["name"] if decisions else None,
-        "consent_template": decisions[0].get("consent_template") if decisions else None
+        "decision_name": calc_yaml["_decision_name"],
+        "consent_template": calc_yaml["_consent_template"]
     }
 
 
@@ -121,11 +159,11 @@ def contraindicated(calc_yaml: Dict[str, Any], decision_name: str, features: Dic
                 continue
             
             if c["op"] == ">" and float(v) > float(c["value"]):
-                return True, c
+                return True, dict(c)
             if c["op"] == "<" and float(v) < float(c["value"]):
-                return True, c
+                return True, dict(c)
             if c["op"] == "==" and float(v) == float(c["value"]):
-                return True, c
+                return True, dict(c)
     
     return False, {}
 
@@ -163,6 +201,9 @@ def decide_and_prepare(patient_features: Dict[str, Any], red_flags: List[str] =
     """
     Main decision function: Score patient for procedures and prepare routing
     
+    Plans are memoized per (patient_features, red_flags); every call returns
+    its own copy, so callers may mutate the plan freely.
+    
     Args:
         patient_features: Dict of patient features (PIRADS, PSAD, etc.)
         red_flags: List of red flag conditions (default: [])
@@ -173,6 +214,40 @@ def decide_and_prepare(patient_features: Dict[str, Any], red_flags: List[str] =
     if red_flags is None:
         red_flags = []
     
+    try:
+        key = (freeze(patient_features), tuple(red_flags))
+        hash(key)
+    except TypeError:
+        # Unhashable values (e.g. nested dicts) can't be cached
+        return _decide_and_prepare(patient_features, red_flags)
+    
+    return _copy_plan(_cached_plan(*key))
+
+
+@functools.lru_cache(maxsize=4096)
+def _cached_plan(
+    features_key: Tuple[Tuple[str, type, Any], ...],
+    red_flags: Tuple[str, ...]
+) -> Dict[str, Any]:
+    """Memoized plan; never hand out without _copy_plan"""
+    return _decide_and_prepare(thaw(features_key), list(red_flags))
+
+
+def _copy_plan(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a plan down to the containers callers mutate"""
+    copy = dict(plan)
+    for section in ("biopsy", "hifu"):
+        copy[section] = dict(plan[section])
+        copy[section]["evidence_hits"] = [dict(hit) for hit in plan[section]["evidence_hits"]]
+    if plan["hifu"]["contra_reason"] is not None:
+        copy["hifu"]["contra_reason"] = dict(plan["hifu"]["contra_reason"])
+    copy["next_steps"] = list(plan["next_steps"])
+    copy["red_flags"] = list(plan["red_flags"])
+    return copy
+
+
+def _decide_and_prepare(patient_features: Dict[str, Any], red_flags: List[str]) -> Dict[str, Any]:
+    """Uncached decide_and_prepare"""
     # Load calculators
     biopsy = load_calculator("biopsy")
     hifu = load_calculator("hifu")
@@ -4,10 +4,13 @@ Minimal tools focused on the urology calculator workflow
 """
 
 import json
+import logging
 from agents import function_tool, RunContextWrapper
 from py_mini_racer import MiniRacer
 from typing import Dict, Any, List
 
+logger = logging.getLogger(__name__)
+
 # =============================================================================
 # RED FLAG SAFETY CHECK (ONE QUESTION)
 # =============================================================================
@@ -168,7 +171,7 @@ def build_probability_graph(context: RunContextWrapper[Any]) -> Dict[str, Any]:
         from differentials.urology_calculator import compute_urology_differential, calculate_entropy
         from differentials.graph_engine import ProbabilityGraph
         
-        print(f"DEBUG build_probability_graph: Starting with reported_symptoms = {context.context.reported_symptoms}")
+        logger.debug("build_probability_graph: Starting with reported_symptoms = %s", context.context.reported_symptoms)
         
         # Prepare symptoms dict for calculator
         symptoms = {
@@ -191,12 +194,12 @@ def build_probability_graph(context: RunContextWrapper[Any]) -> Dict[str, Any]:
             "previous_kidney_stones": context.context.__dict__.get("previous_kidney_stones", False)
         }
         
-        print(f"DEBUG build_probability_graph: Calling calculator with symptoms={symptoms}, patient_info={patient_info}")
+        logger.debug("build_probability_graph: Calling calculator with symptoms=%s, patient_info=%s", symptoms, patient_info)
         
         # Call the REAL Bayesian calculator
         result = compute_urology_differential(symptoms, patient_info)
         
-        print(f"DEBUG build_probability_graph: Calculator returned probabilities = {result['probabilities']}")
+        logger.debug("build_probability_graph: Calculator returned probabilities = %s", result["probabilities"])
         
         # Calculate entropy
         entropy = calculate_entropy(result["probabilities"])
@@ -271,24 +274,22 @@ def find_strategic_questions(context: RunContextWrapper[Any], max_questions: int
         if not graph_dict:
             return {"error": "No graph in context. Call build_probability_graph first."}
         
-        print(f"DEBUG find_strategic_questions: Graph has {len(graph_dict.get('nodes', {}))} nodes")
+        logger.debug("find_strategic_questions: Graph has %d nodes", len(graph_dict.get("nodes", {})))
         
         # Convert to ProbabilityGraph object
-        graph = ProbabilityGraph()
-        graph.nodes = graph_dict["nodes"]
-        graph.edges = graph_dict["edges"]
+        graph = ProbabilityGraph.from_dict(graph_dict)
         
         # Get known symptoms as seed
         known_symptoms = [
             node_id for node_id, node in graph.nodes.items()
-            if node["type"] == "symptom" and node.get("value") is not None
+            if node.type == "symptom" and node.value is not None
         ]
         
-        print(f"DEBUG find_strategic_questions: Known symptoms (seeds) = {known_symptoms}")
+        logger.debug("find_strategic_questions: Known symptoms (seeds) = %s", known_symptoms)
         
         if not known_symptoms:
             # No symptoms yet - suggest based on current probabilities
-            print("DEBUG find_strategic_questions: No seeds yet, returning high-value initial questions")
+            logger.debug("find_strategic_questions: No seeds yet, returning high-value initial questions")
             return {
                 "pivot_count": 0,
                 "working_set_size": 0,
@@ -312,26 +313,29 @@ def find_strategic_questions(context: RunContextWrapper[Any], max_questions: int
             }
         
         # Run FindPivots with known symptoms
-        print(f"DEBUG find_strategic_questions: Running FindPivots with seeds={known_symptoms}")
+        logger.debug("find_strategic_questions: Running FindPivots with seeds=%s", known_symptoms)
         pivots, working_set = find_pivots(graph, known_symptoms, B=1.0, k=3)
         
-        print(f"DEBUG find_strategic_questions: FindPivots returned pivots={pivots}, working_set={working_set}")
+        logger.debug("find_strategic_questions: FindPivots returned pivots=%s, working_set=%s", pivots, working_set)
         
         # Expand working set to include symptoms connected to diseases
         # FindPivots returns disease nodes, but we need symptom nodes to ask about
         expanded_working_set = set()
         for node_id in working_set:
-            node = graph.nodes.get(node_id, {})
-            if node.get("type") == "symptom":
+            node = graph.nodes.get(node_id)
+            if node is None:
+                continue
+            if node.type == "symptom":
                 expanded_working_set.add(node_id)
-            elif node.get("type") == "disease":
+            elif node.type == "disease":
                 # Find symptoms that connect to this disease
-                for edge in graph.edges:
-                    if edge["to"] == node_id and graph.nodes.get(edge["from"], {}).get("type") == "symptom":
-                        expanded_working_set.add(edge["from"])
+                for source_id, _ in graph.in_adj.get(node_id, ()):
+                    source = graph.nodes.get(source_id)
+                    if source is not None and source.type == "symptom":
+                        expanded_working_set.add(source_id)
         
         working_set = expanded_working_set
-        print(f"DEBUG find_strategic_questions: Expanded working set to symptoms: {working_set}")
+        logger.debug("find_strategic_questions: Expanded working set to symptoms: %s", working_set)
         
         # Store pivot nodes in context
         context.context.pivot_nodes = list(pivots)
@@ -366,10 +370,10 @@ def find_strategic_questions(context: RunContextWrapper[Any], max_questions: int
                 break
             
             checked.add(next_symptom)
-            node = graph.nodes.get(next_symptom, {})
+            node = graph.nodes.get(next_symptom)
             gain = expected_information_gain(graph, next_symptom, current_symptoms, patient_info)
             
-            print(f"DEBUG find_strategic_questions: Suggesting symptom={next_symptom}, gain={gain}")
+            logger.debug("find_strategic_questions: Suggesting symptom=%s, gain=%s", next_symptom, gain)
             
             # Format question based on symptom type
             if "severity" in next_symptom or next_symptom in ["dysuria_severity", "weak_stream_severity", "pain_severity"]:
@@ -383,7 +387,7 @@ def find_strategic_questions(context: RunContextWrapper[Any], max_questions: int
                 question = "How many times do you wake up at night to urinate?"
                 qtype = "number"
             else:
-                label = node.get("label", next_symptom.replace("_", " "))
+                label = node.label if node is not None and node.label else next_symptom.replace("_", " ")
                 question = f"Do you have {label.lower()}?"
                 qtype = "yes_no"
             
@@ -440,7 +444,7 @@ def update_graph_with_answer(
         
         # Store answer in context using the CORRECT key
         context.context.__dict__[storage_key] = value
-        print(f"DEBUG update_graph_with_answer: Stored {storage_key}={value} in context")
+        logger.debug("update_graph_with_answer: Stored %s=%s in context", storage_key, value)
         
         # If severity-related, ensure it's stored as numeric
         if "severity" in storage_key or storage_key in ["nocturia_per_night", "pain_severity"]:
@@ -452,7 +456,7 @@ def update_graph_with_answer(
         # Remove from reported_symptoms if it was there (now answered)
         if symptom_id in context.context.reported_symptoms:
             context.context.reported_symptoms.remove(symptom_id)
-            print(f"DEBUG update_graph_with_answer: Removed '{symptom_id}' from reported_symptoms")
+            logger.debug("update_graph_with_answer: Removed '%s' from reported_symptoms", symptom_id)
         
         # Recalculate with new info using the calculator directly
         from differentials.urology_calculator import compute_urology_differential, calculate_entropy
@@ -493,12 +497,12 @@ def update_graph_with_answer(
         # Mark the original symptom_id (e.g., "fever") if it exists in graph
         if symptom_id in graph["nodes"]:
             graph["nodes"][symptom_id]["value"] = value
-            print(f"DEBUG update_graph_with_answer: Marked {symptom_id} with value={value} in graph")
+            logger.debug("update_graph_with_answer: Marked %s with value=%s in graph", symptom_id, value)
         
         # Mark the mapped calculator key (e.g., "fever_present") if different
         if storage_key != symptom_id and storage_key in graph["nodes"]:
             graph["nodes"][storage_key]["value"] = value
-            print(f"DEBUG update_graph_with_answer: Also marked calculator key {storage_key} with value={value}")
+            logger.debug("update_graph_with_answer: Also marked calculator key %s with value=%s", storage_key, value)
         
         context.context.probability_graph = graph
         
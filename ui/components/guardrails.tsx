@@ -13,14 +13,12 @@ interface GuardrailsProps {
 
 export function Guardrails({ guardrails, inputGuardrails }: GuardrailsProps) {
   const guardrailNameMap: Record<string, string> = {
-    relevance_guardrail: "Relevance Guardrail",
-    jailbreak_guardrail: "Jailbreak Guardrail",
+    message_guardrail: "Relevance and Jailbreak Guardrail",
   };
 
   const guardrailDescriptionMap: Record<string, string> = {
-    "Relevance Guardrail": "Ensure messages are relevant to airline support",
-    "Jailbreak Guardrail":
-      "Detect and block attempts to bypass or override system instructions",
+    "Relevance and Jailbreak Guardrail":
+      "Ensure messages are on topic and block attempts to bypass or override system instructions",
   };
 
   const extractGuardrailName = (rawName: string): string =>